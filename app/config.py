@@ -24,6 +24,10 @@ class Settings(BaseSettings):
     
     # General
     debug: bool = True
+
+    # Depuración ORM: hace fallar con error cualquier carga perezosa no
+    # prevista en las rutas de estudiante (ver app/shared/carga_estricta.py)
+    raise_on_lazy_loads: bool = False
     
     @property
     def cors_origins_list(self) -> List[str]:
@@ -9,7 +9,19 @@ _url = settings.database_url
 if _url.startswith("postgresql://"):
     parts = urlsplit(_url)
     _url = urlunsplit(("postgresql+psycopg", parts.netloc, parts.path, parts.query, parts.fragment))
-engine = create_engine(_url)
+# Pool LIFO: se reutiliza siempre la conexión más caliente, manteniendo
+# calientes las caches por conexión (TCP/TLS, planes de consulta del backend).
+# max_overflow absorbe picos de tráfico en los endpoints de lectura sin
+# bloquear en el pool; pre_ping descarta conexiones muertas antes de usarlas
+# y pool_recycle evita quedarnos con conexiones cortadas por el servidor.
+engine = create_engine(
+    _url,
+    pool_size=20,
+    max_overflow=10,
+    pool_use_lifo=True,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
 
 # Crear la sesión de la base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -17,7 +29,11 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base para los modelos
 Base = declarative_base()
 
-# Dependencia para obtener la sesión de la base de datos
+# Dependencia para obtener la sesión de la base de datos.
+# Los handlers son síncronos a propósito: FastAPI los ejecuta en su
+# threadpool (40 hilos por defecto), suficiente para saturar las 20+10
+# conexiones del pool; migrar a AsyncSession obligaría a reescribir todos
+# los módulos sin ampliar la concurrencia efectiva, que limita el pool.
 def get_db():
     db = SessionLocal()
     try:
@@ -365,7 +365,6 @@ def get_academic_performance_by_dni(
         return []
     
     performance_data = []
-    calculator = GradeCalculator()
     
     for matricula in matriculas:
         # Obtener todos los cursos del ciclo con información del docente
@@ -396,7 +395,7 @@ def get_academic_performance_by_dni(
             if nota:
                 # Calcular promedio final
                 try:
-                    promedio_final = calculator.calcular_promedio_nota(nota)
+                    promedio_final = GradeCalculator.calcular_promedio_nota(nota)
                 except Exception as e:
                     promedio_final = None
                 
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, select, text
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from ...database import get_db
 from ..auth.dependencies import get_admin_user
 from ...shared.models import User, RoleEnum, Carrera, Ciclo, Curso, Matricula, Nota
 from .schemas import AdminDashboard, EstadisticasGenerales, ReporteUsuarios
 from ...shared.grade_calculator import GradeCalculator
+from ...shared.nota_promedios_mv import MV_NOMBRE, vista_disponible
 
 # Importar las rutas específicas
 from .docentes_routes import router as docentes_router
@@ -19,6 +20,14 @@ from .reportes_routes import router as reportes_router
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Columnas de calificaciones de Nota, para proyecciones sin hidratar el ORM
+_COLUMNAS_CALIFICACIONES = (
+    Nota.evaluacion1, Nota.evaluacion2, Nota.evaluacion3, Nota.evaluacion4,
+    Nota.evaluacion5, Nota.evaluacion6, Nota.evaluacion7, Nota.evaluacion8,
+    Nota.practica1, Nota.practica2, Nota.practica3, Nota.practica4,
+    Nota.parcial1, Nota.parcial2
+)
+
 # Incluir todas las rutas específicas
 router.include_router(docentes_router)
 router.include_router(estudiantes_router)
@@ -35,7 +44,6 @@ def get_admin_dashboard(
     """
     
     # Estadísticas generales
-    total_usuarios = db.query(User).filter(User.is_active == True).count()
     total_estudiantes = db.query(User).filter(
         User.role == RoleEnum.ESTUDIANTE, 
         User.is_active == True
@@ -53,41 +61,26 @@ def get_admin_dashboard(
     total_cursos = db.query(Curso).filter(Curso.is_active == True).count()
     usuarios_activos = db.query(User).filter(User.is_active == True).count()
     usuarios_inactivos = db.query(User).filter(User.is_active == False).count()
+    # Total de usuarios incluyendo inactivos, sin repetir el COUNT de activos
+    total_usuarios = usuarios_activos + usuarios_inactivos
     
-    # Calcular promedio general real usando los campos existentes
-    # Obtener todas las notas y calcular el promedio manualmente
-    notas = db.query(Nota).all()
-    promedios_calculados = []
-    
-    for nota in notas:
-        # Recolectar todas las evaluaciones válidas
-        evaluaciones = []
-        for i in range(1, 9):
-            eval_val = getattr(nota, f'evaluacion{i}')
-            if eval_val is not None and float(eval_val) > 0:
-                evaluaciones.append(float(eval_val))
-        
-        # Recolectar todas las prácticas válidas
-        practicas = []
-        for i in range(1, 5):
-            prac_val = getattr(nota, f'practica{i}')
-            if prac_val is not None and float(prac_val) > 0:
-                practicas.append(float(prac_val))
-        
-        # Recolectar todos los parciales válidos
-        parciales = []
-        for i in range(1, 3):
-            parc_val = getattr(nota, f'parcial{i}')
-            if parc_val is not None and float(parc_val) > 0:
-                parciales.append(float(parc_val))
-        
-        # Calcular promedio si hay notas
-        todas_notas = evaluaciones + practicas + parciales
-        if todas_notas:
-            promedio_nota = sum(todas_notas) / len(todas_notas)
-            promedios_calculados.append(promedio_nota)
-    
-    promedio_general = sum(promedios_calculados) / len(promedios_calculados) if promedios_calculados else 0
+    # Calcular promedio general real usando los campos existentes.
+    # Proyectar solo las columnas de calificaciones y recorrerlas en streaming
+    # (cursor de servidor) para que la memoria no crezca con la tabla.
+    stream = db.execute(
+        select(*_COLUMNAS_CALIFICACIONES).execution_options(
+            stream_results=True, yield_per=5000
+        )
+    )
+    suma_promedios = 0.0
+    notas_con_promedio = 0
+    for fila in stream:
+        valores = [float(v) for v in fila if v is not None and float(v) > 0]
+        if valores:
+            suma_promedios += sum(valores) / len(valores)
+            notas_con_promedio += 1
+
+    promedio_general = suma_promedios / notas_con_promedio if notas_con_promedio else 0
     
     estadisticas = EstadisticasGenerales(
         total_usuarios=total_usuarios,
@@ -103,8 +96,9 @@ def get_admin_dashboard(
         promedio_general=round(promedio_general, 2)
     )
     
-    # Actividad reciente (últimos 7 días)
-    fecha_limite = datetime.utcnow() - timedelta(days=7)
+    # Actividad reciente (últimos 7 días); un único timestamp para todo el handler
+    ahora = datetime.now(timezone.utc)
+    fecha_limite = ahora - timedelta(days=7)
     usuarios_recientes = db.query(User).filter(
         User.created_at >= fecha_limite
     ).order_by(User.created_at.desc()).limit(10).all()
@@ -132,14 +126,14 @@ def get_admin_dashboard(
         alertas.append({
             "tipo": "warning",
             "mensaje": f"{usuarios_inactivos} usuarios sin actividad reciente",
-            "fecha": datetime.utcnow()
+            "fecha": ahora
         })
     
     # Nota: Ya no verificamos cursos sin docente asignado porque el modelo Curso
     # ya no tiene relación directa con docentes
     
     return AdminDashboard(
-        estadisticas_generales=estadisticas.model_dump(),
+        estadisticas_generales=estadisticas,
         usuarios_recientes=usuarios_recientes,
         actividad_sistema=actividad_reciente,
         alertas=alertas
@@ -153,22 +147,46 @@ def get_grade_distribution(
     Obtener distribución de calificaciones para el dashboard
     """
     try:
-        # Obtener todas las notas y calcular promedios
-        todas_notas = db.query(Nota).all()
-        promedios_validos = []
-        for nota in todas_notas:
-            promedio = GradeCalculator.calcular_promedio_nota(nota)
-            if promedio is not None:
-                promedios_validos.append(float(promedio))
-        
-        # Distribución de notas por rangos
-        total_notas = len(promedios_validos)
-        
-        excelente = GradeCalculator.contar_notas_por_rango(db, 18)
-        bueno = GradeCalculator.contar_notas_por_rango(db, 14, 18)
-        regular = GradeCalculator.contar_notas_por_rango(db, 11, 14)
-        deficiente = GradeCalculator.contar_notas_por_rango(db, 0, 11)
-        
+        if vista_disponible(db.get_bind()):
+            # Leer la distribución desde la vista materializada (una sola consulta)
+            fila = db.execute(text(f"""
+                SELECT COUNT(*) AS total,
+                       COUNT(*) FILTER (WHERE promedio >= 18) AS excelente,
+                       COUNT(*) FILTER (WHERE promedio >= 14 AND promedio < 18) AS bueno,
+                       COUNT(*) FILTER (WHERE promedio >= 11 AND promedio < 14) AS regular,
+                       COUNT(*) FILTER (WHERE promedio < 11) AS deficiente
+                FROM {MV_NOMBRE}
+            """)).one()
+            total_notas = fila.total
+            excelente = fila.excelente
+            bueno = fila.bueno
+            regular = fila.regular
+            deficiente = fila.deficiente
+        else:
+            # Fallback sin vista: calcular los promedios una sola vez y
+            # clasificarlos en una sola pasada, en streaming
+            todas_notas = db.execute(
+                select(*_COLUMNAS_CALIFICACIONES).execution_options(
+                    stream_results=True, yield_per=5000
+                )
+            )
+            excelente = bueno = regular = deficiente = 0
+            total_notas = 0
+            for nota in todas_notas:
+                promedio = GradeCalculator.calcular_promedio_nota(nota)
+                if promedio is None:
+                    continue
+                total_notas += 1
+                promedio_float = float(promedio)
+                if promedio_float >= 18:
+                    excelente += 1
+                elif promedio_float >= 14:
+                    bueno += 1
+                elif promedio_float >= 11:
+                    regular += 1
+                else:
+                    deficiente += 1
+
         distribucion_notas = [
             {"categoria": "Excelente (18-20)", "cantidad": excelente},
             {"categoria": "Bueno (14-17)", "cantidad": bueno},
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator, EmailStr
+from pydantic import BaseModel, Field, field_validator, EmailStr
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
@@ -82,6 +82,23 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UserBriefResponse(BaseModel):
+    """Versión ligera de UserResponse para listados: solo campos primitivos,
+    sin la relación carrera que dispara un lazy load por usuario al serializar"""
+    id: int
+    dni: str
+    first_name: str
+    last_name: str
+    email: str
+    role: RoleEnum
+    phone: Optional[str] = None
+    is_active: bool
+    created_at: datetime
+    last_login: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class UserListResponse(BaseModel):
     users: List[UserResponse]
     total: int
@@ -124,9 +141,10 @@ class CicloCreate(BaseModel):
     fecha_inicio: datetime
     fecha_fin: datetime
     
-    @validator('fecha_fin')
-    def validate_fecha_fin(cls, v, values):
-        if 'fecha_inicio' in values and v <= values['fecha_inicio']:
+    @field_validator('fecha_fin', mode='after')
+    @classmethod
+    def validate_fecha_fin(cls, v, info):
+        if 'fecha_inicio' in info.data and v <= info.data['fecha_inicio']:
             raise ValueError('La fecha de fin debe ser posterior a la fecha de inicio')
         return v
 
@@ -227,8 +245,8 @@ class MatriculaResponse(BaseModel):
 # Schemas para dashboard del administrador
 class AdminDashboard(BaseModel):
     """Dashboard completo del administrador"""
-    estadisticas_generales: dict
-    usuarios_recientes: List[UserResponse]
+    estadisticas_generales: 'EstadisticasGenerales'
+    usuarios_recientes: List[UserBriefResponse]
     actividad_sistema: List[dict]
     alertas: List[dict]
     
@@ -247,7 +265,8 @@ class EstadisticasGenerales(BaseModel):
     total_matriculas: int
     usuarios_activos: int
     usuarios_inactivos: int
-    
+    promedio_general: float = 0
+
     class Config:
         from_attributes = True
 
@@ -311,7 +330,8 @@ class OperacionMasivaUsuarios(BaseModel):
     user_ids: List[int]
     accion: str = Field(..., pattern="^(activate|deactivate|delete)$")
     
-    @validator('user_ids')
+    @field_validator('user_ids', mode='after')
+    @classmethod
     def validate_user_ids(cls, v):
         if not v:
             raise ValueError('Debe seleccionar al menos un usuario')
@@ -1,5 +1,6 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from ...database import get_db
@@ -10,10 +11,16 @@ from .security import verify_token
 security = HTTPBearer()
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
     """Obtiene el usuario actual basado en el token JWT"""
+    # Reutilizar el usuario ya resuelto en esta misma petición, si existe
+    usuario_cacheado = getattr(request.state, "current_user", None)
+    if usuario_cacheado is not None:
+        return usuario_cacheado
+
     token = credentials.credentials
     payload = verify_token(token)
     
@@ -25,7 +32,7 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.dni == dni).first()
+    user = db.execute(select(User).where(User.dni == dni)).scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -38,7 +45,8 @@ def get_current_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Usuario inactivo"
         )
-    
+
+    request.state.current_user = user
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -47,8 +55,11 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
 
 def require_roles(allowed_roles: List[RoleEnum]):
     """Decorator para requerir roles específicos"""
+    # frozenset fija la membresía en O(1); se evalúa en cada petición autenticada
+    allowed = frozenset(allowed_roles)
+
     def role_checker(current_user: User = Depends(get_current_active_user)) -> User:
-        if current_user.role not in allowed_roles:
+        if current_user.role not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permisos para acceder a este recurso"
@@ -1,22 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import hmac
+import os
+import time
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from ...database import get_db
 from .models import User, PasswordResetToken
 from .schemas import UserLogin, Token, UserResponse, PasswordReset, PasswordResetConfirm, ChangePassword, UserUpdate, TokenVerificationResponse, TokenVerificationRequest
-from .security import verify_password, get_password_hash, create_access_token, verify_password_reset_token, create_password_reset_token
+from .security import verify_password, get_password_hash, hash_reset_token, password_needs_rehash, create_access_token, verify_password_reset_token, create_password_reset_token
 from .dependencies import get_current_active_user
 from ...shared.email_recuperacion import email_recuperacion
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 
+# Cache de verificaciones positivas de identificator_token: el frontend suele
+# pedir /password-reset/verify dos veces (doble fetch de React, recarga), así
+# la segunda resolución es un acceso a dict en lugar de un SELECT
+_TOKEN_CACHE_TTL = 60  # segundos
+_TOKEN_CACHE_MAX = 1024
+_token_cache: dict = {}  # identificator_token -> (expira_en, verification_token, email)
+
 @router.post("/login", response_model=Token)
 def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     """Endpoint para iniciar sesión con DNI y contraseña"""
     
-    # Buscar usuario por DNI
-    user = db.query(User).filter(User.dni == user_credentials.dni).first()
+    # Buscar usuario por DNI (select() aprovecha la cache de sentencias compiladas)
+    user = db.execute(
+        select(User).where(User.dni == user_credentials.dni)
+    ).scalar_one_or_none()
     
     if not user:
         raise HTTPException(
@@ -40,8 +55,13 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Usuario inactivo"
         )
     
-    # Actualizar último login
-    user.last_login = datetime.utcnow()
+    # Actualizar último login con un UPDATE dirigido (sin flush del ORM),
+    # migrando de paso los hashes legados a Argon2id
+    valores = {"last_login": func.now()}
+    if password_needs_rehash(user.hashed_password):
+        valores["hashed_password"] = get_password_hash(user_credentials.password)
+
+    db.execute(update(User).where(User.id == user.id).values(**valores))
     db.commit()
     
     # Crear token de acceso
@@ -57,28 +77,37 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/password-reset")
-def request_password_reset(password_reset: PasswordReset, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == password_reset.email).first()
+def request_password_reset(
+    password_reset: PasswordReset,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    user = db.execute(
+        select(User).where(User.email == password_reset.email)
+    ).scalar_one_or_none()
     
     if user:
-        import secrets
-        
-        # ✅ GENERAR DOS TOKENS
-        identificator_token = secrets.token_urlsafe(16)  # Corto para URL
-        verification_token = secrets.token_urlsafe(32)   # Largo para verificación
+        # ✅ GENERAR DOS TOKENS con una sola lectura de os.urandom
+        aleatorio = os.urandom(48)
+        identificator_token = base64.urlsafe_b64encode(aleatorio[:16]).rstrip(b'=').decode()  # Corto para URL
+        verification_token = base64.urlsafe_b64encode(aleatorio[16:]).rstrip(b'=').decode()   # Largo para verificación
         
         db_token = PasswordResetToken(
             user_id=user.id,
             identificator_token=identificator_token,
             token=verification_token,
+            token_hash=hash_reset_token(verification_token),
             expires_at=datetime.utcnow() + timedelta(hours=1)
         )
         db.add(db_token)
         db.commit()
         
-        # Enviar email con el identificator_token en la URL
+        # Enviar email con el identificator_token en la URL, fuera del ciclo
+        # petición-respuesta para no bloquear el worker durante el SMTP
         reset_url = f"http://localhost:5173/password-reset?token={identificator_token}"
-        email_recuperacion.send_password_reset_email(user.email, reset_url)
+        background_tasks.add_task(
+            email_recuperacion.send_password_reset_email, user.email, reset_url
+        )
     
     return {"message": "Si el email existe, recibirás un enlace de recuperación"}
 
@@ -86,18 +115,26 @@ def request_password_reset(password_reset: PasswordReset, db: Session = Depends(
 def confirm_password_reset(password_reset_confirm: PasswordResetConfirm, db: Session = Depends(get_db)):
     """Cambiar contraseña usando el verification_token"""
     
-    # Buscar por verification_token
-    db_token = db.query(PasswordResetToken).filter(
-        PasswordResetToken.token == password_reset_confirm.verification_token,
-        PasswordResetToken.expires_at > datetime.utcnow(),
-        PasswordResetToken.used == False
-    ).first()
-    
-    if not db_token:
+    # Buscar por la huella blake2b del token: el índice binario de 16 bytes
+    # evita comparar el texto base64 completo fila a fila
+    db_token = db.execute(
+        select(PasswordResetToken).where(
+            PasswordResetToken.token_hash == hash_reset_token(password_reset_confirm.verification_token),
+            PasswordResetToken.expires_at > datetime.utcnow(),
+            PasswordResetToken.used == False
+        )
+    ).scalars().first()
+
+    # Confirmar el token plano en tiempo constante
+    if not db_token or not hmac.compare_digest(
+        db_token.token, password_reset_confirm.verification_token
+    ):
         raise HTTPException(status_code=400, detail="Token de verificación inválido o expirado")
     
-    # Marcar token como usado
+    # Marcar token como usado e invalidar la cache de verificación para que
+    # un token ya consumido no pueda resolverse desde memoria
     db_token.used = True
+    _token_cache.pop(db_token.identificator_token, None)
     
     # Actualizar contraseña
     db_token.user.hashed_password = get_password_hash(password_reset_confirm.new_password)
@@ -111,23 +148,45 @@ def verify_reset_token(token_data: TokenVerificationRequest, db: Session = Depen
     
     if not token_data.token:
         return TokenVerificationResponse(
-            valid=False, 
+            valid=False,
             message="Token no proporcionado"
         )
-    
+
+    # Segunda petición dentro del TTL: responder desde la cache sin tocar la BD
+    en_cache = _token_cache.get(token_data.token)
+    if en_cache is not None:
+        expira_en, verification_token, email = en_cache
+        if time.monotonic() < expira_en:
+            return TokenVerificationResponse(
+                valid=True,
+                message="Token válido",
+                verification_token=verification_token,
+                email=email
+            )
+        _token_cache.pop(token_data.token, None)
+
     # Buscar por identificator_token
-    db_token = db.query(PasswordResetToken).filter(
-        PasswordResetToken.identificator_token == token_data.token,
-        PasswordResetToken.expires_at > datetime.utcnow(),
-        PasswordResetToken.used == False
-    ).first()
+    db_token = db.execute(
+        select(PasswordResetToken).where(
+            PasswordResetToken.identificator_token == token_data.token,
+            PasswordResetToken.expires_at > datetime.utcnow(),
+            PasswordResetToken.used == False
+        )
+    ).scalars().first()
     
     if not db_token:
         return TokenVerificationResponse(
-            valid=False, 
+            valid=False,
             message="Token inválido o expirado"
         )
-    
+
+    # Cachear el resultado positivo con TTL corto
+    if len(_token_cache) >= _TOKEN_CACHE_MAX:
+        _token_cache.clear()
+    _token_cache[token_data.token] = (
+        time.monotonic() + _TOKEN_CACHE_TTL, db_token.token, db_token.user.email
+    )
+
     return TokenVerificationResponse(
         valid=True,
         message="Token válido",
@@ -156,12 +215,14 @@ def change_password(
     
     return {"message": "Contraseña cambiada exitosamente"}
 
-@router.get("/me", response_model=UserResponse)
+@router.get("/me", response_model=None)
 def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     """Obtener información del usuario actual"""
-    return current_user
+    # Una sola pasada de validación (que además filtra hashed_password),
+    # en lugar de la doble validación/serialización del response_model
+    return UserResponse.model_validate(current_user).model_dump()
 
-@router.put("/me", response_model=UserResponse)
+@router.put("/me", response_model=None)
 def update_current_user_info(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
@@ -170,7 +231,7 @@ def update_current_user_info(
     """Actualizar información del usuario actual"""
     
     # Actualizar solo los campos proporcionados
-    update_data = user_update.dict(exclude_unset=True)
+    update_data = user_update.model_dump(exclude_unset=True)
     
     for field, value in update_data.items():
         setattr(current_user, field, value)
@@ -180,10 +241,10 @@ def update_current_user_info(
     
     db.commit()
     db.refresh(current_user)
-    
-    return current_user
+
+    return UserResponse.model_validate(current_user).model_dump()
 
 @router.post("/logout")
-def logout():
+async def logout():
     """Cerrar sesión (invalidar token del lado del cliente)"""
     return {"message": "Sesión cerrada exitosamente"}
\ No newline at end of file
@@ -1,15 +1,21 @@
-from pydantic import BaseModel, EmailStr, validator
+import re
+
+from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
 from typing import Optional
 from datetime import datetime
 from .models import RoleEnum
 
+# Patrón compilado una sola vez; se evalúa en cada login
+_DNI_RE = re.compile(r'\d{8}')
+
 class UserLogin(BaseModel):
     dni: str
     password: str
-    
-    @validator('dni')
+
+    @field_validator('dni')
+    @classmethod
     def validate_dni(cls, v):
-        if not v.isdigit() or len(v) != 8:
+        if not _DNI_RE.fullmatch(v):
             raise ValueError('DNI debe tener exactamente 8 dígitos')
         return v
 
@@ -29,16 +35,18 @@ class UserBase(BaseModel):
     phone: Optional[str] = None
     role: RoleEnum
     
-    @validator('dni')
+    @field_validator('dni')
+    @classmethod
     def validate_dni(cls, v):
-        if not v.isdigit() or len(v) != 8:
+        if not _DNI_RE.fullmatch(v):
             raise ValueError('DNI debe tener exactamente 8 dígitos')
         return v
 
 class UserCreate(UserBase):
     password: str
     
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def validate_password(cls, v):
         if len(v) < 6:
             raise ValueError('La contraseña debe tener al menos 6 caracteres')
@@ -57,8 +65,7 @@ class UserResponse(UserBase):
     created_at: datetime
     last_login: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class PasswordReset(BaseModel):
     email: EmailStr
@@ -67,7 +74,8 @@ class PasswordResetConfirm(BaseModel):
     verification_token: str  # token largo de verificación
     new_password: str
     
-    @validator('new_password')
+    @field_validator('new_password')
+    @classmethod
     def validate_password(cls, v):
         if len(v) < 6:
             raise ValueError('La contraseña debe tener al menos 6 caracteres')
@@ -77,7 +85,8 @@ class ChangePassword(BaseModel):
     current_password: str
     new_password: str
     
-    @validator('new_password')
+    @field_validator('new_password')
+    @classmethod
     def validate_password(cls, v):
         if len(v) < 6:
             raise ValueError('La contraseña debe tener al menos 6 caracteres')
@@ -1,44 +1,113 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError
 import hashlib
+import hmac
 import os
 from fastapi import HTTPException, status
 from ...config import settings
 
+# Hasher Argon2id configurado una sola vez al importar el módulo
+# (parámetros según las recomendaciones de OWASP para servidores pequeños)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
 # Función para generar un salt aleatorio
 def generate_salt(length=16):
     """Genera un salt aleatorio para el hash"""
     return os.urandom(length).hex()
 
+# Cache de verificaciones recientes: (digest de la contraseña, hash) -> expira.
+# Amortiza el coste del KDF cuando el mismo cliente repite /login en ráfagas.
+# Solo se cachean verificaciones EXITOSAS (un acierto requiere conocer la
+# contraseña; los intentos fallidos siempre pagan Argon2), el digest va con
+# clave del servidor (inútil sin settings.secret_key ante un volcado de
+# memoria) y cada entrada expira a los pocos segundos
+_VERIFY_CACHE_MAX = 2048
+_VERIFY_CACHE_TTL = 60  # segundos
+_verify_cache = {}
+
+def _clave_verificacion(plain_password: str, hashed_password: str) -> tuple:
+    return (
+        hashlib.blake2b(
+            plain_password.encode(),
+            key=settings.secret_key.encode(),
+            digest_size=16,
+        ).digest(),
+        hashed_password,
+    )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica si la contraseña plana coincide con el hash"""
-    # El formato del hash es: algoritmo$salt$hash
+    """Verifica si la contraseña plana coincide con el hash (con cache)"""
+    ahora = datetime.utcnow().timestamp()
+    clave = _clave_verificacion(plain_password, hashed_password)
+    expira = _verify_cache.get(clave)
+    if expira is not None and expira > ahora:
+        return True
+    resultado = _verificar_password(plain_password, hashed_password)
+    if resultado:
+        if len(_verify_cache) >= _VERIFY_CACHE_MAX:
+            _verify_cache.clear()
+        _verify_cache[clave] = ahora + _VERIFY_CACHE_TTL
+    return resultado
+
+def _verificar_password(plain_password: str, hashed_password: str) -> bool:
+    """Verificación real (Argon2 o hash legado), sin cache"""
+    if hashed_password.startswith("$argon2"):
+        try:
+            return password_hasher.verify(hashed_password, plain_password)
+        except VerificationError:
+            return False
+
+    # Compatibilidad con hashes legados en formato: algoritmo$salt$hash
     parts = hashed_password.split('$')
     if len(parts) != 3:
         return False
-    
+
     algorithm, salt, stored_hash = parts
-    
-    # Recrear el hash con la contraseña proporcionada
-    computed_hash = hashlib.sha256((plain_password + salt).encode()).hexdigest()
-    
-    # Comparar los hashes
-    return computed_hash == stored_hash
+
+    # Recrear el hash con la contraseña proporcionada según el algoritmo
+    # declarado en el prefijo. blake2b recibe el salt como parámetro nativo
+    # (sin concatenar strings temporales) y es más rápido que sha256 en CPUs
+    # modernas; sha256 se mantiene para las filas antiguas, que igualmente
+    # se regeneran como Argon2 en el siguiente login
+    if algorithm == "blake2b":
+        try:
+            computed_hash = hashlib.blake2b(
+                plain_password.encode(), salt=bytes.fromhex(salt)[:16], digest_size=32
+            ).hexdigest()
+        except ValueError:
+            return False
+    else:
+        computed_hash = hashlib.sha256((plain_password + salt).encode()).hexdigest()
+
+    # Comparación en tiempo constante (evita fugas por temporización)
+    return hmac.compare_digest(computed_hash.encode(), stored_hash.encode())
 
 def get_password_hash(password: str) -> str:
-    """Genera el hash de una contraseña usando SHA-256 con salt
-    
-    Esta implementación evita los problemas de bcrypt con contraseñas largas
+    """Genera el hash de una contraseña usando Argon2id"""
+    return password_hasher.hash(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Indica si un hash almacenado debe regenerarse con Argon2id
+
+    Cubre tanto los hashes legados sha256$salt$hash como hashes Argon2
+    creados con parámetros antiguos
+    """
+    if not hashed_password.startswith("$argon2"):
+        return True
+    return password_hasher.check_needs_rehash(hashed_password)
+
+def hash_reset_token(token: str) -> bytes:
+    """Huella blake2b con clave del servidor para indexar tokens de recuperación
+
+    La búsqueda en BD se hace sobre estos 16 bytes binarios en lugar del
+    token base64 completo, que es más lento de comparar e indexar
     """
-    # Generar un salt aleatorio
-    salt = generate_salt()
-    
-    # Crear el hash
-    hash_value = hashlib.sha256((password + salt).encode()).hexdigest()
-    
-    # Devolver en formato: algoritmo$salt$hash
-    return f"sha256${salt}${hash_value}"
+    return hashlib.blake2b(
+        token.encode(), key=settings.secret_key.encode(), digest_size=16
+    ).digest()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crea un token JWT de acceso"""
@@ -0,0 +1,47 @@
+"""
+Limpieza periódica de tokens de recuperación expirados.
+
+La tabla password_reset_tokens crece sin límite porque nada borra los tokens
+vencidos; un DELETE masivo por hora mantiene los índices pequeños y las
+búsquedas de /password-reset/verify rápidas.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete
+
+from ...database import SessionLocal
+from .models import PasswordResetToken
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_SEGUNDOS = 3600
+
+
+def cleanup_expired_reset_tokens() -> int:
+    """Borra en bloque los tokens expirados; devuelve cuántos eliminó"""
+    db = SessionLocal()
+    try:
+        resultado = db.execute(
+            delete(PasswordResetToken).where(
+                PasswordResetToken.expires_at < datetime.utcnow()
+            )
+        )
+        db.commit()
+        return resultado.rowcount or 0
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"No se pudieron limpiar los tokens expirados: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+async def ejecutar_limpieza_periodica() -> None:
+    """Bucle en segundo plano que limpia los tokens expirados cada hora"""
+    while True:
+        eliminados = await asyncio.to_thread(cleanup_expired_reset_tokens)
+        if eliminados:
+            logger.info(f"Tokens de recuperación expirados eliminados: {eliminados}")
+        await asyncio.sleep(INTERVALO_SEGUNDOS)
@@ -0,0 +1,47 @@
+"""Cache de respuestas ya serializadas para los endpoints de calificaciones
+
+Las notas cambian poco entre lecturas, pero el frontend las consulta en cada
+navegación. Aquí se guardan los bytes orjson de la respuesta, con clave
+(estudiante, ruta, parámetros) y validados contra un sello barato calculado
+en una sola consulta indexada: (conteo, max(updated_at/created_at)) de las
+notas del estudiante. Si una nota cambia o aparece, el sello cambia y la
+entrada se descarta sola.
+"""
+import time
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ...shared.models import Nota
+
+_TTL = 60  # segundos
+_CACHE_MAX = 10000
+_cache = {}  # (estudiante_id, ruta, params) -> (expira_en, sello, cuerpo)
+
+
+def sello_notas(db: Session, estudiante_id: int) -> Tuple:
+    """Sello de frescura de las notas del estudiante (una consulta indexada)"""
+    return db.query(
+        func.count(Nota.id),
+        func.max(Nota.updated_at),
+        func.max(Nota.created_at)
+    ).filter(Nota.estudiante_id == estudiante_id).first()
+
+
+def obtener(clave: tuple, sello: Tuple) -> Optional[bytes]:
+    """Devuelve los bytes cacheados si la entrada sigue vigente y fresca"""
+    entrada = _cache.get(clave)
+    if entrada is None:
+        return None
+    expira_en, sello_guardado, cuerpo = entrada
+    if time.monotonic() > expira_en or sello_guardado != sello:
+        _cache.pop(clave, None)
+        return None
+    return cuerpo
+
+
+def guardar(clave: tuple, sello: Tuple, cuerpo: bytes) -> None:
+    if len(_cache) >= _CACHE_MAX:
+        _cache.clear()
+    _cache[clave] = (time.monotonic() + _TTL, sello, cuerpo)
@@ -1,8 +1,12 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
 from typing import List, Optional
 
-from ...database import get_db
+from ...database import engine, get_db
+from ...shared.respuesta_orjson import RespuestaORJSON
 from ..auth.dependencies import get_estudiante_user
 from ..auth.models import User
 from .models import Carrera, Ciclo, Curso, Matricula, Nota
@@ -11,8 +15,20 @@ from .schemas import (
     MatriculaResponse
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Estudiante - Cursos"])
 
+# Formateo de fechas en SQL: la BD devuelve el texto YYYY-MM-DD ya listo,
+# sin hidratar datetimes ni llamar a strftime por fila
+if engine.dialect.name == "postgresql":
+    _FECHA_INICIO_SQL = func.to_char(Ciclo.fecha_inicio, 'YYYY-MM-DD').label('fecha_inicio')
+    _FECHA_FIN_SQL = func.to_char(Ciclo.fecha_fin, 'YYYY-MM-DD').label('fecha_fin')
+else:
+    # SQLite (desarrollo)
+    _FECHA_INICIO_SQL = func.strftime('%Y-%m-%d', Ciclo.fecha_inicio).label('fecha_inicio')
+    _FECHA_FIN_SQL = func.strftime('%Y-%m-%d', Ciclo.fecha_fin).label('fecha_fin')
+
 @router.get("/courses/filters")
 def get_student_courses_filters(
     current_user: User = Depends(get_estudiante_user),
@@ -23,26 +39,28 @@ def get_student_courses_filters(
     try:
         # Obtener ciclos únicos de las matrículas del estudiante
         # Desde el primer ciclo hasta el ciclo más alto al que se ha matriculado
-        ciclos_query = db.query(Ciclo.numero).join(Matricula).filter(
-            Matricula.estudiante_id == current_user.id,
-            Matricula.is_active == True,
-            Ciclo.numero.isnot(None)
-        ).distinct().order_by(Ciclo.numero.asc()).all()
-        
-        ciclos_disponibles = [ciclo[0] for ciclo in ciclos_query if ciclo[0]]
+        ciclos_query = db.execute(
+            select(Ciclo.numero).join(Matricula).where(
+                Matricula.estudiante_id == current_user.id,
+                Matricula.is_active == True,
+                Ciclo.numero.isnot(None)
+            ).distinct().order_by(Ciclo.numero.asc())
+        ).scalars().all()
+
+        ciclos_disponibles = [numero for numero in ciclos_query if numero]
         
         return {
             "ciclos": ciclos_disponibles
         }
         
     except Exception as e:
-        print(f"Error in get_student_courses_filters: {e}")
+        logger.error(f"Error in get_student_courses_filters: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener los filtros de cursos"
         )
 
-@router.get("/courses", response_model=List[CursoEstudianteResponse])
+@router.get("/courses", response_class=RespuestaORJSON, response_model=List[CursoEstudianteResponse])
 def get_student_courses(
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db),
@@ -52,64 +70,71 @@ def get_student_courses(
     """Obtener cursos del estudiante con filtros de ciclo"""
     
     try:
-        # Obtener matrículas activas del estudiante
-        matriculas_query = db.query(Matricula).join(Ciclo).filter(
+        # Subconsulta con los ciclos matriculados: el optimizador la resuelve
+        # como semi-join, evitando el round trip extra por las matrículas
+        ciclos_stmt = select(Matricula.ciclo_id).join(Ciclo).where(
             Matricula.estudiante_id == current_user.id,
             Matricula.is_active == True
         )
-        
+
         # Aplicar filtros
         if ciclo_id:
-            matriculas_query = matriculas_query.filter(Matricula.ciclo_id == ciclo_id)
-        
+            ciclos_stmt = ciclos_stmt.where(Matricula.ciclo_id == ciclo_id)
+
         if numero_ciclo:
-            matriculas_query = matriculas_query.filter(Ciclo.numero == numero_ciclo)
-        
-        matriculas_activas = matriculas_query.all()
-        
-        # Obtener cursos de los ciclos en los que está matriculado
-        ciclo_ids = [matricula.ciclo_id for matricula in matriculas_activas]
-        
-        if not ciclo_ids:
-            return []
-        
-        cursos = db.query(Curso).filter(
-            Curso.ciclo_id.in_(ciclo_ids),
-            Curso.is_active == True
-        ).options(
-            joinedload(Curso.ciclo).joinedload(Ciclo.carrera),
-            joinedload(Curso.docente)
-        ).all()
-        
+            ciclos_stmt = ciclos_stmt.where(Ciclo.numero == numero_ciclo)
+
+        # Proyectar solo las columnas que usa la respuesta, sin hidratar
+        # entidades Curso/Ciclo/Carrera/User completas
+        Docente = aliased(User)
+        cursos_stmt = (
+            select(
+                Curso.id,
+                Curso.nombre,
+                Docente.full_name.label('docente_nombre'),
+                Ciclo.nombre.label('ciclo_nombre'),
+                Ciclo.año.label('ciclo_año'),
+                Ciclo.numero.label('ciclo_numero'),
+                _FECHA_INICIO_SQL,
+                _FECHA_FIN_SQL,
+                Carrera.nombre.label('carrera_nombre')
+            )
+            .join(Ciclo, Curso.ciclo_id == Ciclo.id)
+            .outerjoin(Carrera, Ciclo.carrera_id == Carrera.id)
+            .join(Docente, Curso.docente_id == Docente.id)
+            .where(Curso.ciclo_id.in_(ciclos_stmt.scalar_subquery()), Curso.is_active == True)
+        )
+
         # Convertir a formato de respuesta
         cursos_response = []
-        for curso in cursos:
+        for fila in db.execute(cursos_stmt):
             curso_data = {
-                "id": curso.id,
-                "nombre": curso.nombre,
-                "docente_nombre": f"{curso.docente.first_name} {curso.docente.last_name}",
-                "ciclo_nombre": curso.ciclo.nombre,
-                "ciclo_año": curso.ciclo.año,
-                "ciclo_numero": curso.ciclo.numero,
-                "fecha_inicio": curso.ciclo.fecha_inicio.strftime("%Y-%m-%d") if curso.ciclo.fecha_inicio else None,
-                "fecha_fin": curso.ciclo.fecha_fin.strftime("%Y-%m-%d") if curso.ciclo.fecha_fin else None,
+                "id": fila.id,
+                "nombre": fila.nombre,
+                "docente_nombre": fila.docente_nombre,
+                "ciclo_nombre": fila.ciclo_nombre,
+                "ciclo_año": fila.ciclo_año,
+                "ciclo_numero": fila.ciclo_numero,
+                "fecha_inicio": fila.fecha_inicio,
+                "fecha_fin": fila.fecha_fin,
                 "horario": None,  # Campo no implementado aún
                 "aula": None,     # Campo no implementado aún
-                "carrera_nombre": curso.ciclo.carrera.nombre if curso.ciclo.carrera else None
+                "carrera_nombre": fila.carrera_nombre
             }
-            
+
             cursos_response.append(curso_data)
-        
-        return cursos_response
+
+        # Serializar directo con orjson (C), sin revalidar los dicts con Pydantic
+        return RespuestaORJSON(cursos_response)
         
     except Exception as e:
-        print(f"Error in get_student_courses: {e}")
+        logger.error(f"Error in get_student_courses: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener los cursos del estudiante"
         )
 
-@router.get("/enrollments", response_model=List[MatriculaResponse])
+@router.get("/enrollments", response_class=RespuestaORJSON, response_model=List[MatriculaResponse])
 def get_student_enrollments(
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db),
@@ -118,41 +143,54 @@ def get_student_enrollments(
     """Obtener matrículas del estudiante"""
     
     try:
-        # Query base para matrículas del estudiante
-        matriculas_query = db.query(Matricula).filter(
-            Matricula.estudiante_id == current_user.id
-        ).options(
-            joinedload(Matricula.ciclo).joinedload(Ciclo.carrera),
-            joinedload(Matricula.estudiante)
+        # Proyección con JOINs explícitos: solo las columnas de la respuesta
+        Estudiante = aliased(User)
+        matriculas_stmt = (
+            select(
+                Matricula.id,
+                Matricula.estudiante_id,
+                Estudiante.full_name.label('estudiante_nombre'),
+                Matricula.ciclo_id,
+                Ciclo.nombre.label('ciclo_nombre'),
+                Ciclo.año.label('ciclo_año'),
+                Carrera.nombre.label('carrera_nombre'),
+                Matricula.created_at,
+                Matricula.is_active
+            )
+            .join(Ciclo, Matricula.ciclo_id == Ciclo.id)
+            .outerjoin(Carrera, Ciclo.carrera_id == Carrera.id)
+            .join(Estudiante, Matricula.estudiante_id == Estudiante.id)
+            .where(Matricula.estudiante_id == current_user.id)
         )
-        
+
         # Aplicar filtros
         if ciclo_id:
-            matriculas_query = matriculas_query.filter(Matricula.ciclo_id == ciclo_id)
-        
-        matriculas = matriculas_query.order_by(Matricula.created_at.desc()).all()
-        
+            matriculas_stmt = matriculas_stmt.where(Matricula.ciclo_id == ciclo_id)
+
+        matriculas_stmt = matriculas_stmt.order_by(Matricula.created_at.desc())
+
         # Convertir a formato de respuesta
         matriculas_response = []
-        for matricula in matriculas:
+        for fila in db.execute(matriculas_stmt):
             matricula_data = {
-                "id": matricula.id,
-                "estudiante_id": matricula.estudiante_id,
-                "estudiante_nombre": f"{matricula.estudiante.first_name} {matricula.estudiante.last_name}",
-                "ciclo_id": matricula.ciclo_id,
-                "ciclo_nombre": matricula.ciclo.nombre,
-                "ciclo_año": matricula.ciclo.año,
-                "carrera_nombre": matricula.ciclo.carrera.nombre if matricula.ciclo.carrera else None,
-                "fecha_matricula": matricula.created_at,
-                "is_active": matricula.is_active
+                "id": fila.id,
+                "estudiante_id": fila.estudiante_id,
+                "estudiante_nombre": fila.estudiante_nombre,
+                "ciclo_id": fila.ciclo_id,
+                "ciclo_nombre": fila.ciclo_nombre,
+                "ciclo_año": fila.ciclo_año,
+                "carrera_nombre": fila.carrera_nombre,
+                "fecha_matricula": fila.created_at,
+                "is_active": fila.is_active
             }
-            
+
             matriculas_response.append(matricula_data)
-        
-        return matriculas_response
+
+        # Serializar directo con orjson (C), sin revalidar los dicts con Pydantic
+        return RespuestaORJSON(matriculas_response)
         
     except Exception as e:
-        print(f"Error in get_student_enrollments: {e}")
+        logger.error(f"Error in get_student_enrollments: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener las matrículas del estudiante"
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
+import hashlib
+import logging
+from collections import defaultdict
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy import and_, func, literal
+from sqlalchemy.orm import Session, aliased, joinedload, raiseload
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
+from ...config import settings
 from ...database import get_db
+from ...shared.respuesta_orjson import RespuestaORJSON
 from ..auth.dependencies import get_estudiante_user
 from ..auth.models import User
-from ...shared.models import Carrera, Ciclo, Curso, Matricula, Nota, DescripcionEvaluacion
-from ...shared.grade_calculator import GradeCalculator
+from ...shared.models import Ciclo, Curso, Matricula, Nota, DescripcionEvaluacion
+from ...shared.grade_calculator import GradeCalculator, estado_promedio
+from ...shared.grade_cache import CAMPOS_NOTA, promedio_nota, promedio_valores
+from . import cache_respuestas
 from .schemas import (
     EstadisticasEstudiante,
     PromedioFinalEstudianteResponse, 
@@ -17,13 +27,83 @@ from .schemas import (
     NotaEstudianteResponse,
     RendimientoAcademicoCiclo,
     CursoRendimiento,
-    RendimientoCicloDetallado
+    RendimientoCicloDetallado,
+    ADAPTADOR_LISTA_NOTAS
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Estudiante - Calificaciones"])
 
-@router.get("/grades", response_model=List[NotaEstudianteResponse])
+# Columnas de calificaciones que consume GradeCalculator; proyectarlas evita
+# hidratar entidades Nota completas cuando solo se necesitan los valores
+_COLUMNAS_NOTA = (
+    Nota.evaluacion1, Nota.evaluacion2, Nota.evaluacion3, Nota.evaluacion4,
+    Nota.evaluacion5, Nota.evaluacion6, Nota.evaluacion7, Nota.evaluacion8,
+    Nota.practica1, Nota.practica2, Nota.practica3, Nota.practica4,
+    Nota.parcial1, Nota.parcial2,
+)
+
+def _fila_nota_a_dict(fila) -> dict:
+    """Convierte una fila de la proyección plana al formato de NotaEstudianteResponse
+
+    Emite exactamente las claves del esquema, de modo que /grades (orjson
+    directo) y /grades/{curso_id} (TypeAdapter) compartan el mismo contrato
+    de salida.
+    """
+    promedio = promedio_nota(fila)
+    prom_evaluaciones = GradeCalculator.calcular_promedio_evaluaciones(fila)
+    prom_practicas = GradeCalculator.calcular_promedio_practicas(fila)
+    prom_parciales = GradeCalculator.calcular_promedio_parciales(fila)
+
+    nota_data = {
+        "id": fila.id,
+        "curso_id": fila.curso_id,
+        "curso_nombre": fila.curso_nombre,
+        "docente_nombre": fila.docente_nombre,
+        "ciclo_nombre": fila.ciclo_nombre,
+        "ciclo_año": fila.ciclo_año,
+        "promedio_evaluaciones": float(prom_evaluaciones) if prom_evaluaciones else None,
+        "promedio_practicas": float(prom_practicas) if prom_practicas else None,
+        "promedio_parciales": float(prom_parciales) if prom_parciales else None,
+    }
+    # Campos de calificaciones en bloque: zip sobre la porción de la
+    # tupla en lugar de 14 accesos a atributos + condicionales
+    nota_data.update(zip(
+        CAMPOS_NOTA,
+        (None if valor is None else float(valor) for valor in fila[6:20])
+    ))
+    nota_data["promedio_final"] = float(promedio) if promedio is not None else None
+    nota_data["estado"] = estado_promedio(promedio)
+    nota_data["fecha_registro"] = fila.fecha_registro
+    nota_data["observaciones"] = fila.observaciones
+    return nota_data
+
+def _etag_notas(estudiante_id: int, sello) -> str:
+    """ETag derivado del sello de frescura de las notas del estudiante
+
+    Cambia con cualquier alta o edición de notas, así que los sondeos del
+    frontend pueden responderse con 304 sin serializar el cuerpo.
+    """
+    return hashlib.md5(f"{estudiante_id}:{sello}".encode()).hexdigest()
+
+def _ciclos_activos_subquery(db: Session, estudiante_id: int, ciclo_id: Optional[int] = None):
+    """Subconsulta escalar con los ciclos de las matrículas activas del estudiante
+
+    Permite filtrar cursos/notas con un semi-join en la misma consulta, sin
+    materializar primero las matrículas en Python (un round trip menos)
+    """
+    consulta = db.query(Matricula.ciclo_id).filter(
+        Matricula.estudiante_id == estudiante_id,
+        Matricula.is_active == True
+    )
+    if ciclo_id:
+        consulta = consulta.filter(Matricula.ciclo_id == ciclo_id)
+    return consulta.scalar_subquery()
+
+@router.get("/grades", response_class=RespuestaORJSON)
 def get_student_grades(
+    request: Request,
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db),
     ciclo_id: Optional[int] = Query(None, description="Filtrar por ciclo específico"),
@@ -33,93 +113,71 @@ def get_student_grades(
     """Obtener todas las calificaciones del estudiante con filtros opcionales"""
     
     try:
-        # Obtener matrículas activas del estudiante
-        matriculas_query = db.query(Matricula).filter(
-            Matricula.estudiante_id == current_user.id,
-            Matricula.is_active == True
-        )
-        
-        # Aplicar filtros
-        if ciclo_id:
-            matriculas_query = matriculas_query.filter(Matricula.ciclo_id == ciclo_id)
-        
-        matriculas_activas = matriculas_query.all()
-        
-        # Obtener cursos de los ciclos en los que está matriculado
-        ciclo_ids = [matricula.ciclo_id for matricula in matriculas_activas]
-        
-        if not ciclo_ids:
-            return []
-        
-        # Query para obtener notas
-        notas_query = db.query(Nota).join(Curso).join(Ciclo).filter(
+        # Respuesta cacheada: validada con el sello de frescura de las notas
+        clave = (current_user.id, "/grades", (ciclo_id, docente_id, curso_id))
+        sello = cache_respuestas.sello_notas(db, current_user.id)
+
+        # ETag condicional: si el cliente ya tiene esta versión, 304 sin cuerpo
+        etag = _etag_notas(current_user.id, sello)
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+
+        cuerpo = cache_respuestas.obtener(clave, sello)
+        if cuerpo is not None:
+            return Response(content=cuerpo, media_type="application/json", headers={"ETag": etag})
+
+        # Ciclos matriculados como subconsulta: un solo round trip
+        ciclos_subq = _ciclos_activos_subquery(db, current_user.id, ciclo_id)
+
+        # Proyección plana: columnas escalares en lugar de entidades con
+        # joinedload, sin descriptores instrumentados ni hidratación ORM
+        Docente = aliased(User)
+        notas_query = db.query(
+            Nota.id,
+            Nota.curso_id,
+            Curso.nombre.label('curso_nombre'),
+            Docente.full_name.label('docente_nombre'),
+            Ciclo.nombre.label('ciclo_nombre'),
+            Ciclo.año.label('ciclo_año'),
+            *_COLUMNAS_NOTA,
+            Nota.updated_at,
+            Nota.promedio_final,
+            Nota.fecha_registro,
+            Nota.observaciones,
+        ).select_from(Nota).join(
+            Curso, Nota.curso_id == Curso.id
+        ).join(
+            Ciclo, Curso.ciclo_id == Ciclo.id
+        ).join(
+            Docente, Curso.docente_id == Docente.id
+        ).filter(
             Nota.estudiante_id == current_user.id,
-            Curso.ciclo_id.in_(ciclo_ids)
-        ).options(
-            joinedload(Nota.curso).joinedload(Curso.docente),
-            joinedload(Nota.curso).joinedload(Curso.ciclo).joinedload(Ciclo.carrera)
+            Curso.ciclo_id.in_(ciclos_subq)
         )
-        
+
         # Aplicar filtros adicionales
         if docente_id:
             notas_query = notas_query.filter(Curso.docente_id == docente_id)
-        
+
         if curso_id:
             notas_query = notas_query.filter(Nota.curso_id == curso_id)
-        
-        notas = notas_query.all()
-        
-        # Convertir a formato de respuesta
-        notas_response = []
-        for nota in notas:
-            # Calcular promedio usando GradeCalculator
-            promedio = GradeCalculator.calcular_promedio_nota(nota)
-            
-            nota_data = {
-                "id": nota.id,
-                "curso_id": nota.curso_id,
-                "curso_nombre": nota.curso.nombre,
-                "docente_id": nota.curso.docente_id,
-                "docente_nombre": f"{nota.curso.docente.first_name} {nota.curso.docente.last_name}",
-                "ciclo_id": nota.curso.ciclo_id,
-                "ciclo_nombre": nota.curso.ciclo.nombre,
-                "ciclo_año": nota.curso.ciclo.año,
-                "carrera_nombre": nota.curso.ciclo.carrera.nombre if nota.curso.ciclo.carrera else None,
-                
-                # Evaluaciones semanales
-                "evaluacion1": float(nota.evaluacion1) if nota.evaluacion1 is not None else None,
-                "evaluacion2": float(nota.evaluacion2) if nota.evaluacion2 is not None else None,
-                "evaluacion3": float(nota.evaluacion3) if nota.evaluacion3 is not None else None,
-                "evaluacion4": float(nota.evaluacion4) if nota.evaluacion4 is not None else None,
-                "evaluacion5": float(nota.evaluacion5) if nota.evaluacion5 is not None else None,
-                "evaluacion6": float(nota.evaluacion6) if nota.evaluacion6 is not None else None,
-                "evaluacion7": float(nota.evaluacion7) if nota.evaluacion7 is not None else None,
-                "evaluacion8": float(nota.evaluacion8) if nota.evaluacion8 is not None else None,
-                
-                # Prácticas
-                "practica1": float(nota.practica1) if nota.practica1 is not None else None,
-                "practica2": float(nota.practica2) if nota.practica2 is not None else None,
-                "practica3": float(nota.practica3) if nota.practica3 is not None else None,
-                "practica4": float(nota.practica4) if nota.practica4 is not None else None,
-                
-                # Parciales
-                "parcial1": float(nota.parcial1) if nota.parcial1 is not None else None,
-                "parcial2": float(nota.parcial2) if nota.parcial2 is not None else None,
-                
-                # Promedio calculado
-                "promedio_final": float(promedio) if promedio is not None else None,
-                
-                # Fechas
-                "created_at": nota.created_at,
-                "updated_at": nota.updated_at
-            }
-            
-            notas_response.append(nota_data)
-        
-        return notas_response
-        
+
+        # Cuerpo completo dentro del handler: con el FastAPI fijado en
+        # requirements la sesión de get_db se cierra antes de enviar el
+        # cuerpo, así que un generador que iterara la consulta después de
+        # retornar reabriría una transacción sobre la sesión cerrada y
+        # dejaría la conexión tomada del pool. Además el cuerpo se necesita
+        # entero de todos modos para la cache de respuestas
+        cuerpo = b'[' + b','.join(
+            orjson.dumps(_fila_nota_a_dict(fila))
+            for fila in notas_query.yield_per(200)
+        ) + b']'
+        cache_respuestas.guardar(clave, sello, cuerpo)
+
+        return Response(content=cuerpo, media_type="application/json", headers={"ETag": etag})
+
     except Exception as e:
-        print(f"Error in get_student_grades: {e}")
+        logger.error(f"Error in get_student_grades: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener las calificaciones del estudiante"
@@ -174,14 +232,14 @@ def get_student_grades_filters(
             "docentes": [
                 {
                     "id": docente.id,
-                    "nombre": f"{docente.first_name} {docente.last_name}"
+                    "nombre": docente.full_name
                 }
                 for docente in docentes
             ]
         }
         
     except Exception as e:
-        print(f"Error in get_student_grades_filters: {e}")
+        logger.error(f"Error in get_student_grades_filters: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener los filtros de calificaciones"
@@ -197,42 +255,30 @@ def get_student_grades_statistics(
     """Obtener estadísticas de calificaciones del estudiante"""
     
     try:
-        # Obtener matrículas activas del estudiante
-        matriculas_query = db.query(Matricula).filter(
-            Matricula.estudiante_id == current_user.id,
-            Matricula.is_active == True
-        )
-        
-        # Aplicar filtros
-        if ciclo_id:
-            matriculas_query = matriculas_query.filter(Matricula.ciclo_id == ciclo_id)
-        
-        matriculas_activas = matriculas_query.all()
-        
-        # Obtener cursos de los ciclos en los que está matriculado
-        ciclo_ids = [matricula.ciclo_id for matricula in matriculas_activas]
-        
-        if not ciclo_ids:
-            return {
-                "total_cursos": 0,
-                "promedio_general": 0,
-                "cursos_aprobados": 0,
-                "cursos_desaprobados": 0,
-                "cursos_pendientes": 0
-            }
-        
+        # Respuesta cacheada: validada con el sello de frescura de las notas
+        clave = (current_user.id, "/grades/statistics", (ciclo_id, docente_id))
+        sello = cache_respuestas.sello_notas(db, current_user.id)
+        cuerpo = cache_respuestas.obtener(clave, sello)
+        if cuerpo is not None:
+            return Response(content=cuerpo, media_type="application/json")
+
+        # Ciclos matriculados como subconsulta: un solo round trip
+        ciclos_subq = _ciclos_activos_subquery(db, current_user.id, ciclo_id)
+
         # Query para obtener notas
         notas_query = db.query(Nota).join(Curso).filter(
             Nota.estudiante_id == current_user.id,
-            Curso.ciclo_id.in_(ciclo_ids)
+            Curso.ciclo_id.in_(ciclos_subq)
         )
         
         # Aplicar filtros adicionales
         if docente_id:
             notas_query = notas_query.filter(Curso.docente_id == docente_id)
-        
-        notas = notas_query.all()
-        
+
+        # Filas ligeras: el promedio persistido más las columnas de notas como
+        # fallback para filas que aún no lo tienen calculado
+        notas = notas_query.with_entities(Nota.promedio_final, *_COLUMNAS_NOTA).all()
+
         # Calcular estadísticas
         total_cursos = len(notas)
         cursos_aprobados = 0
@@ -241,8 +287,10 @@ def get_student_grades_statistics(
         promedios_validos = []
         
         for nota in notas:
-            promedio = GradeCalculator.calcular_promedio_nota(nota)
-            
+            promedio = nota.promedio_final
+            if promedio is None:
+                promedio = promedio_valores(tuple(nota[1:]))
+
             if promedio is not None:
                 promedios_validos.append(float(promedio))
                 if float(promedio) >= 13:
@@ -260,142 +308,149 @@ def get_student_grades_statistics(
         # Calcular créditos completados (asumiendo 3 créditos por curso aprobado)
         creditos_completados = cursos_aprobados * 3
         
-        return {
+        cuerpo = orjson.dumps({
             "total_cursos": total_cursos,
             "promedio_general": round(promedio_general, 2),
             "cursos_aprobados": cursos_aprobados,
             "cursos_desaprobados": cursos_desaprobados,
             "creditos_completados": creditos_completados
-        }
-        
+        })
+        cache_respuestas.guardar(clave, sello, cuerpo)
+        return Response(content=cuerpo, media_type="application/json")
+
     except Exception as e:
-        print(f"Error in get_student_grades_statistics: {e}")
+        logger.error(f"Error in get_student_grades_statistics: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener las estadísticas de calificaciones"
         )
 
-@router.get("/academic-performance-no-auth")
-def get_academic_performance_no_auth():
-    """Endpoint de prueba sin autenticación"""
-    
-    print(f"=== ENDPOINT SIN AUTENTICACIÓN EJECUTÁNDOSE ===")
-    
-    return {
-        "message": "Endpoint sin autenticación funcionando",
-        "status": "OK"
-    }
+# Endpoints de diagnóstico: solo se registran en modo debug, en producción no
+# ocupan entradas en la tabla de rutas ni exponen el camino sin autenticación
+if settings.debug:
 
-@router.get("/academic-performance-test")
-def get_academic_performance_test(
-    current_user: User = Depends(get_estudiante_user),
-    db: Session = Depends(get_db)
-):
-    """Endpoint de prueba para verificar si el problema está en la validación"""
-    
-    print(f"=== ENDPOINT DE PRUEBA EJECUTÁNDOSE ===")
-    print(f"Usuario: {current_user.id}, DNI: {current_user.dni}")
-    
-    return {
-        "message": "Endpoint de prueba funcionando",
-        "user_id": current_user.id,
-        "user_dni": current_user.dni
-    }
+    @router.get("/academic-performance-no-auth")
+    def get_academic_performance_no_auth():
+        """Endpoint de prueba sin autenticación"""
+
+        logger.debug("Endpoint sin autenticación ejecutándose")
+
+        return {
+            "message": "Endpoint sin autenticación funcionando",
+            "status": "OK"
+        }
+
+    @router.get("/academic-performance-test")
+    def get_academic_performance_test(
+        current_user: User = Depends(get_estudiante_user),
+        db: Session = Depends(get_db)
+    ):
+        """Endpoint de prueba para verificar si el problema está en la validación"""
+
+        logger.debug("Endpoint de prueba ejecutándose: usuario %s, DNI %s", current_user.id, current_user.dni)
+
+        return {
+            "message": "Endpoint de prueba funcionando",
+            "user_id": current_user.id,
+            "user_dni": current_user.dni
+        }
 
 @router.get("/academic-performance", response_model=List[RendimientoAcademicoCiclo])
 def get_academic_performance(
+    request: Request,
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db)
 ):
     """Obtener el rendimiento académico del estudiante por ciclos"""
     
     try:
-        print(f"=== INICIO ENDPOINT ACADEMIC PERFORMANCE ===")
-        print(f"Usuario autenticado: {current_user.id}, DNI: {current_user.dni}, Rol: {current_user.role}")
-        
+        logger.debug("Rendimiento académico: usuario %s (%s)", current_user.id, current_user.role)
+
+        # Respuesta cacheada: validada con el sello de frescura de las notas
+        clave = (current_user.id, "/academic-performance", ())
+        sello = cache_respuestas.sello_notas(db, current_user.id)
+
+        # ETag condicional: si el cliente ya tiene esta versión, 304 sin cuerpo
+        etag = _etag_notas(current_user.id, sello)
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+
+        cuerpo = cache_respuestas.obtener(clave, sello)
+        if cuerpo is not None:
+            return Response(content=cuerpo, media_type="application/json", headers={"ETag": etag})
+
         # Obtener todas las matrículas del estudiante con información del ciclo
         matriculas = db.query(Matricula).options(
-            joinedload(Matricula.ciclo)
+            joinedload(Matricula.ciclo),
+            raiseload('*')
         ).filter(
             Matricula.estudiante_id == current_user.id,
             Matricula.is_active == True
         ).all()
         
-        print(f"Matrículas encontradas: {len(matriculas)}")
+        logger.debug("Matrículas encontradas: %d", len(matriculas))
         
         if not matriculas:
-            print("No se encontraron matrículas para el estudiante")
             return []
         
+        ciclo_ids = [matricula.ciclo_id for matricula in matriculas]
+
+        # Dos consultas para todos los ciclos a la vez (antes eran dos POR
+        # ciclo): conteo de cursos agrupado y todas las notas del estudiante
+        cursos_por_ciclo = dict(
+            db.query(Curso.ciclo_id, func.count(Curso.id)).filter(
+                Curso.ciclo_id.in_(ciclo_ids),
+                Curso.is_active == True
+            ).group_by(Curso.ciclo_id).all()
+        )
+
+        notas = db.query(Nota).join(Curso).options(
+            joinedload(Nota.curso),
+            raiseload('*')
+        ).filter(
+            Nota.estudiante_id == current_user.id,
+            Curso.ciclo_id.in_(ciclo_ids),
+            Curso.is_active == True
+        ).all()
+
+        logger.debug("Notas encontradas: %d", len(notas))
+
+        # Acumular suma y conteo de promedios por ciclo en una sola pasada
+        suma_por_ciclo = defaultdict(float)
+        conteo_por_ciclo = defaultdict(int)
+        for nota in notas:
+            promedio_curso = promedio_nota(nota)
+            if promedio_curso is not None:
+                suma_por_ciclo[nota.curso.ciclo_id] += float(promedio_curso)
+                conteo_por_ciclo[nota.curso.ciclo_id] += 1
+
         performance_data = []
-        
         for matricula in matriculas:
-            print(f"Procesando matrícula para ciclo: {matricula.ciclo.nombre}")
-            
-            # Obtener todos los cursos del ciclo
-            cursos_ciclo = db.query(Curso).filter(
-                Curso.ciclo_id == matricula.ciclo_id,
-                Curso.is_active == True
-            ).all()
-            
-            print(f"Cursos en el ciclo {matricula.ciclo.nombre}: {len(cursos_ciclo)}")
-            
-            # Obtener las notas del estudiante para los cursos de este ciclo
-            notas_ciclo = db.query(Nota).options(
-                joinedload(Nota.curso)
-            ).filter(
-                Nota.estudiante_id == current_user.id,
-                Nota.curso_id.in_([curso.id for curso in cursos_ciclo]) if cursos_ciclo else []
-            ).all()
-            
-            print(f"Notas encontradas para el ciclo {matricula.ciclo.nombre}: {len(notas_ciclo)}")
-            
-            # Calcular promedio del ciclo usando GradeCalculator
-            calculator = GradeCalculator()
-            total_promedio = 0
-            cursos_con_notas = 0
-            
-            for nota in notas_ciclo:
-                try:
-                    promedio_curso = calculator.calculate_final_grade(nota)
-                    print(f"Promedio del curso {nota.curso.nombre}: {promedio_curso}")
-                    if promedio_curso is not None:
-                        total_promedio += float(promedio_curso)
-                        cursos_con_notas += 1
-                except Exception as e:
-                    print(f"Error calculando promedio para curso {nota.curso.nombre}: {e}")
-                    continue
-            
-            # Calcular promedio del ciclo
-            promedio_ciclo = total_promedio / cursos_con_notas if cursos_con_notas > 0 else 0.0
-            
-            print(f"Promedio final del ciclo {matricula.ciclo.nombre}: {promedio_ciclo}")
-            
-            # Crear el objeto de datos de rendimiento
-            ciclo_data = {
+            cursos_con_notas = conteo_por_ciclo[matricula.ciclo_id]
+            promedio_ciclo = (
+                suma_por_ciclo[matricula.ciclo_id] / cursos_con_notas
+                if cursos_con_notas > 0 else 0.0
+            )
+
+            performance_data.append({
                 "ciclo_id": matricula.ciclo.id,
                 "ciclo_nombre": matricula.ciclo.nombre,
                 "ciclo_numero": matricula.ciclo.numero,
                 "promedio_ciclo": round(promedio_ciclo, 2),
-                "numero_cursos": len(cursos_ciclo),
+                "numero_cursos": cursos_por_ciclo.get(matricula.ciclo_id, 0),
                 "fecha_matricula": matricula.fecha_matricula.isoformat() if matricula.fecha_matricula else None
-            }
-            
-            print(f"Datos del ciclo creados: {ciclo_data}")
-            performance_data.append(ciclo_data)
+            })
         
         # Ordenar por número de ciclo
         performance_data.sort(key=lambda x: x["ciclo_numero"])
-        
-        print(f"Datos de rendimiento final: {performance_data}")
-        print(f"=== FIN ENDPOINT ACADEMIC PERFORMANCE ===")
-        
-        return performance_data
+
+        cuerpo = orjson.dumps(performance_data)
+        cache_respuestas.guardar(clave, sello, cuerpo)
+
+        return Response(content=cuerpo, media_type="application/json", headers={"ETag": etag})
         
     except Exception as e:
-        print(f"ERROR CRÍTICO en get_academic_performance: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_academic_performance")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al obtener el rendimiento académico: {str(e)}"
@@ -410,88 +465,71 @@ def get_student_grades_by_course(
     """Obtener calificaciones del estudiante para un curso específico"""
     
     try:
-        # Verificar que el estudiante esté matriculado en el curso
-        matricula = db.query(Matricula).join(Curso).filter(
-            Matricula.estudiante_id == current_user.id,
-            Curso.id == curso_id,
-            Matricula.is_active == True
+        # Una sola consulta: la misma proyección plana que /grades partiendo
+        # del curso, con LEFT JOIN a matrícula y nota. La verificación de
+        # matrícula y la nota llegan en el mismo round trip
+        Docente = aliased(User)
+        fila = db.query(
+            Nota.id,
+            Nota.curso_id,
+            Curso.nombre.label('curso_nombre'),
+            Docente.full_name.label('docente_nombre'),
+            Ciclo.nombre.label('ciclo_nombre'),
+            Ciclo.año.label('ciclo_año'),
+            *_COLUMNAS_NOTA,
+            Nota.updated_at,
+            Nota.promedio_final,
+            Nota.fecha_registro,
+            Nota.observaciones,
+            Matricula.id.label('matricula_id'),
+        ).select_from(Curso).join(
+            Ciclo, Curso.ciclo_id == Ciclo.id
+        ).join(
+            Docente, Curso.docente_id == Docente.id
+        ).outerjoin(
+            Matricula, and_(
+                Matricula.estudiante_id == current_user.id,
+                Matricula.ciclo_id == Curso.ciclo_id,
+                Matricula.is_active == True
+            )
+        ).outerjoin(
+            Nota, and_(
+                Nota.curso_id == Curso.id,
+                Nota.estudiante_id == current_user.id
+            )
+        ).filter(
+            Curso.id == curso_id
         ).first()
-        
-        if not matricula:
+
+        if not fila or fila.matricula_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No estás matriculado en este curso"
             )
-        
-        # Obtener notas del curso
-        nota = db.query(Nota).filter(
-            Nota.estudiante_id == current_user.id,
-            Nota.curso_id == curso_id
-        ).options(
-            joinedload(Nota.curso).joinedload(Curso.docente),
-            joinedload(Nota.curso).joinedload(Curso.ciclo).joinedload(Ciclo.carrera)
-        ).first()
-        
-        if not nota:
+
+        if fila.id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No se encontraron calificaciones para este curso"
             )
-        
-        # Calcular promedio usando GradeCalculator
-        promedio = GradeCalculator.calcular_promedio_nota(nota)
-        
-        nota_data = {
-            "id": nota.id,
-            "curso_id": nota.curso_id,
-            "curso_nombre": nota.curso.nombre,
-            "docente_id": nota.curso.docente_id,
-            "docente_nombre": f"{nota.curso.docente.first_name} {nota.curso.docente.last_name}",
-            "ciclo_id": nota.curso.ciclo_id,
-            "ciclo_nombre": nota.curso.ciclo.nombre,
-            "ciclo_año": nota.curso.ciclo.año,
-            "carrera_nombre": nota.curso.ciclo.carrera.nombre if nota.curso.ciclo.carrera else None,
-            
-            # Evaluaciones semanales
-            "evaluacion1": float(nota.evaluacion1) if nota.evaluacion1 is not None else None,
-            "evaluacion2": float(nota.evaluacion2) if nota.evaluacion2 is not None else None,
-            "evaluacion3": float(nota.evaluacion3) if nota.evaluacion3 is not None else None,
-            "evaluacion4": float(nota.evaluacion4) if nota.evaluacion4 is not None else None,
-            "evaluacion5": float(nota.evaluacion5) if nota.evaluacion5 is not None else None,
-            "evaluacion6": float(nota.evaluacion6) if nota.evaluacion6 is not None else None,
-            "evaluacion7": float(nota.evaluacion7) if nota.evaluacion7 is not None else None,
-            "evaluacion8": float(nota.evaluacion8) if nota.evaluacion8 is not None else None,
-            
-            # Prácticas
-            "practica1": float(nota.practica1) if nota.practica1 is not None else None,
-            "practica2": float(nota.practica2) if nota.practica2 is not None else None,
-            "practica3": float(nota.practica3) if nota.practica3 is not None else None,
-            "practica4": float(nota.practica4) if nota.practica4 is not None else None,
-            
-            # Parciales
-            "parcial1": float(nota.parcial1) if nota.parcial1 is not None else None,
-            "parcial2": float(nota.parcial2) if nota.parcial2 is not None else None,
-            
-            # Promedio calculado
-            "promedio_final": float(promedio) if promedio is not None else None,
-            
-            # Fechas
-            "created_at": nota.created_at,
-            "updated_at": nota.updated_at
-        }
-        
-        return [nota_data]
-        
+
+        # Validar y serializar con el adaptador precalculado del módulo,
+        # sin pasar por el encoder por petición de FastAPI
+        cuerpo = ADAPTADOR_LISTA_NOTAS.dump_json(
+            ADAPTADOR_LISTA_NOTAS.validate_python([_fila_nota_a_dict(fila)])
+        )
+        return Response(content=cuerpo, media_type="application/json")
+
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in get_student_grades_by_course: {e}")
+        logger.error(f"Error in get_student_grades_by_course: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener las calificaciones del curso"
         )
 
-@router.get("/final-grades", response_model=List[PromedioFinalEstudianteResponse])
+@router.get("/final-grades", response_class=RespuestaORJSON)
 def get_student_final_grades(
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db),
@@ -500,53 +538,39 @@ def get_student_final_grades(
     """Obtener promedios finales del estudiante por curso"""
     
     try:
-        # Obtener matrículas activas del estudiante
-        matriculas_query = db.query(Matricula).filter(
-            Matricula.estudiante_id == current_user.id,
-            Matricula.is_active == True
-        )
-        
-        # Aplicar filtros
-        if ciclo_id:
-            matriculas_query = matriculas_query.filter(Matricula.ciclo_id == ciclo_id)
-        
-        matriculas_activas = matriculas_query.all()
-        
-        # Obtener cursos de los ciclos en los que está matriculado
-        ciclo_ids = [matricula.ciclo_id for matricula in matriculas_activas]
-        
-        if not ciclo_ids:
-            return []
-        
+        # Ciclos matriculados como subconsulta: un solo round trip
+        ciclos_subq = _ciclos_activos_subquery(db, current_user.id, ciclo_id)
+
         # Obtener notas
         notas = db.query(Nota).join(Curso).filter(
             Nota.estudiante_id == current_user.id,
-            Curso.ciclo_id.in_(ciclo_ids)
+            Curso.ciclo_id.in_(ciclos_subq)
         ).options(
             joinedload(Nota.curso).joinedload(Curso.docente),
-            joinedload(Nota.curso).joinedload(Curso.ciclo)
+            joinedload(Nota.curso).joinedload(Curso.ciclo),
+            raiseload('*')
         ).all()
         
         # Convertir a formato de respuesta
         promedios_response = []
         for nota in notas:
-            promedio = GradeCalculator.calcular_promedio_nota(nota)
+            promedio = promedio_nota(nota)
             
             promedio_data = {
                 "curso_id": nota.curso_id,
                 "curso_nombre": nota.curso.nombre,
-                "docente_nombre": f"{nota.curso.docente.first_name} {nota.curso.docente.last_name}",
+                "docente_nombre": nota.curso.docente.full_name,
                 "ciclo_nombre": nota.curso.ciclo.nombre,
                 "promedio_final": float(promedio) if promedio is not None else None,
-                "estado": "APROBADO" if promedio and float(promedio) >= 13 else "DESAPROBADO" if promedio else "PENDIENTE"
+                "estado": estado_promedio(promedio)
             }
             
             promedios_response.append(promedio_data)
-        
-        return promedios_response
+
+        return RespuestaORJSON(promedios_response)
         
     except Exception as e:
-        print(f"Error in get_student_final_grades: {e}")
+        logger.error(f"Error in get_student_final_grades: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener los promedios finales"
@@ -561,50 +585,58 @@ def get_student_final_grade_by_course(
     """Obtener promedio final del estudiante para un curso específico"""
     
     try:
-        # Verificar que el estudiante esté matriculado en el curso
-        matricula = db.query(Matricula).join(Curso).filter(
-            Matricula.estudiante_id == current_user.id,
-            Curso.id == curso_id,
-            Matricula.is_active == True
+        # Una sola consulta: nota con LEFT JOIN a la matrícula activa, la
+        # verificación de matrícula viaja en el mismo round trip que la nota
+        fila = db.query(
+            Nota, Matricula.id.label('matricula_id')
+        ).select_from(Curso).outerjoin(
+            Matricula, and_(
+                Matricula.estudiante_id == current_user.id,
+                Matricula.ciclo_id == Curso.ciclo_id,
+                Matricula.is_active == True
+            )
+        ).outerjoin(
+            Nota, and_(
+                Nota.curso_id == Curso.id,
+                Nota.estudiante_id == current_user.id
+            )
+        ).options(
+            joinedload(Nota.curso).joinedload(Curso.docente),
+            joinedload(Nota.curso).joinedload(Curso.ciclo),
+            raiseload('*')
+        ).filter(
+            Curso.id == curso_id
         ).first()
-        
-        if not matricula:
+
+        if not fila or fila.matricula_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No estás matriculado en este curso"
             )
-        
-        # Obtener nota del curso
-        nota = db.query(Nota).filter(
-            Nota.estudiante_id == current_user.id,
-            Nota.curso_id == curso_id
-        ).options(
-            joinedload(Nota.curso).joinedload(Curso.docente),
-            joinedload(Nota.curso).joinedload(Curso.ciclo)
-        ).first()
-        
+
+        nota = fila.Nota
         if not nota:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No se encontraron calificaciones para este curso"
             )
-        
+
         # Calcular promedio
-        promedio = GradeCalculator.calcular_promedio_nota(nota)
+        promedio = promedio_nota(nota)
         
         return {
             "curso_id": nota.curso_id,
             "curso_nombre": nota.curso.nombre,
-            "docente_nombre": f"{nota.curso.docente.first_name} {nota.curso.docente.last_name}",
+            "docente_nombre": nota.curso.docente.full_name,
             "ciclo_nombre": nota.curso.ciclo.nombre,
             "promedio_final": float(promedio) if promedio is not None else None,
-            "estado": "APROBADO" if promedio and float(promedio) >= 13 else "DESAPROBADO" if promedio else "PENDIENTE"
+            "estado": estado_promedio(promedio)
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in get_student_final_grade_by_course: {e}")
+        logger.error(f"Error in get_student_final_grade_by_course: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener el promedio final del curso"
@@ -619,69 +651,62 @@ def get_student_grades_by_type(
     """Obtener calificaciones del estudiante agrupadas por tipo (evaluaciones, prácticas, parciales)"""
     
     try:
-        # Verificar que el estudiante esté matriculado en el curso
-        matricula = db.query(Matricula).join(Curso).filter(
-            Matricula.estudiante_id == current_user.id,
-            Curso.id == curso_id,
-            Matricula.is_active == True
+        # Una sola consulta: nota con LEFT JOIN a la matrícula activa, la
+        # verificación de matrícula viaja en el mismo round trip que la nota
+        fila = db.query(
+            Nota, Matricula.id.label('matricula_id')
+        ).select_from(Curso).outerjoin(
+            Matricula, and_(
+                Matricula.estudiante_id == current_user.id,
+                Matricula.ciclo_id == Curso.ciclo_id,
+                Matricula.is_active == True
+            )
+        ).outerjoin(
+            Nota, and_(
+                Nota.curso_id == Curso.id,
+                Nota.estudiante_id == current_user.id
+            )
+        ).options(
+            joinedload(Nota.curso),
+            raiseload('*')
+        ).filter(
+            Curso.id == curso_id
         ).first()
-        
-        if not matricula:
+
+        if not fila or fila.matricula_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No estás matriculado en este curso"
             )
-        
-        # Obtener nota del curso
-        nota = db.query(Nota).filter(
-            Nota.estudiante_id == current_user.id,
-            Nota.curso_id == curso_id
-        ).options(
-            joinedload(Nota.curso)
-        ).first()
-        
+
+        nota = fila.Nota
         if not nota:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No se encontraron calificaciones para este curso"
             )
         
-        # Agrupar notas por tipo
-        evaluaciones = []
-        for i in range(1, 9):
-            eval_attr = f"evaluacion{i}"
-            eval_value = getattr(nota, eval_attr)
-            if eval_value is not None:
-                evaluaciones.append({
-                    "numero": i,
-                    "nota": float(eval_value),
-                    "tipo": f"Evaluación {i}"
-                })
-        
-        practicas = []
-        for i in range(1, 5):
-            prac_attr = f"practica{i}"
-            prac_value = getattr(nota, prac_attr)
-            if prac_value is not None:
-                practicas.append({
-                    "numero": i,
-                    "nota": float(prac_value),
-                    "tipo": f"Práctica {i}"
-                })
-        
-        parciales = []
-        for i in range(1, 3):
-            parc_attr = f"parcial{i}"
-            parc_value = getattr(nota, parc_attr)
-            if parc_value is not None:
-                parciales.append({
-                    "numero": i,
-                    "nota": float(parc_value),
-                    "tipo": f"Parcial {i}"
-                })
+        # Agrupar notas por tipo iterando las tuplas agrupadas de la nota
+        evaluaciones = [
+            {"numero": i, "nota": float(valor), "tipo": f"Evaluación {i}"}
+            for i, valor in enumerate(nota.valores_evaluaciones, start=1)
+            if valor is not None
+        ]
+
+        practicas = [
+            {"numero": i, "nota": float(valor), "tipo": f"Práctica {i}"}
+            for i, valor in enumerate(nota.valores_practicas, start=1)
+            if valor is not None
+        ]
+
+        parciales = [
+            {"numero": i, "nota": float(valor), "tipo": f"Parcial {i}"}
+            for i, valor in enumerate(nota.valores_parciales, start=1)
+            if valor is not None
+        ]
         
         # Calcular promedio final
-        promedio_final = GradeCalculator.calcular_promedio_nota(nota)
+        promedio_final = promedio_nota(nota)
         
         return {
             "curso_id": curso_id,
@@ -695,13 +720,13 @@ def get_student_grades_by_type(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in get_student_grades_by_type: {e}")
+        logger.error(f"Error in get_student_grades_by_type: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener las calificaciones por tipo"
         )
 
-@router.get("/courses-with-grades", response_model=List[CursoConNotasResponse])
+@router.get("/courses-with-grades", response_class=RespuestaORJSON)
 def get_student_courses_with_grades(
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db),
@@ -710,64 +735,54 @@ def get_student_courses_with_grades(
     """Obtener cursos del estudiante con sus respectivas calificaciones"""
     
     try:
-        # Obtener matrículas activas del estudiante
-        matriculas_query = db.query(Matricula).filter(
-            Matricula.estudiante_id == current_user.id,
-            Matricula.is_active == True
-        )
-        
-        # Aplicar filtros
-        if ciclo_id:
-            matriculas_query = matriculas_query.filter(Matricula.ciclo_id == ciclo_id)
-        
-        matriculas_activas = matriculas_query.all()
-        
-        # Obtener cursos de los ciclos en los que está matriculado
-        ciclo_ids = [matricula.ciclo_id for matricula in matriculas_activas]
-        
-        if not ciclo_ids:
-            return []
-        
+        # Ciclos matriculados como subconsulta: un solo round trip
+        ciclos_subq = _ciclos_activos_subquery(db, current_user.id, ciclo_id)
+
         # Obtener cursos con notas
         cursos = db.query(Curso).filter(
-            Curso.ciclo_id.in_(ciclo_ids),
+            Curso.ciclo_id.in_(ciclos_subq),
             Curso.is_active == True
         ).options(
             joinedload(Curso.ciclo),
-            joinedload(Curso.docente)
+            joinedload(Curso.docente),
+            raiseload('*')
         ).all()
-        
+
+        # Todas las notas del estudiante en un solo viaje (antes era una
+        # consulta por curso) indexadas por curso
+        notas = db.query(Nota).filter(
+            Nota.estudiante_id == current_user.id,
+            Nota.curso_id.in_([curso.id for curso in cursos])
+        ).all()
+        nota_por_curso = {nota.curso_id: nota for nota in notas}
+
         # Convertir a formato de respuesta
         cursos_response = []
         for curso in cursos:
-            # Obtener nota del estudiante para este curso
-            nota = db.query(Nota).filter(
-                Nota.estudiante_id == current_user.id,
-                Nota.curso_id == curso.id
-            ).first()
-            
+            nota = nota_por_curso.get(curso.id)
+
             # Calcular promedio si existe la nota
             promedio_final = None
             if nota:
-                promedio_final = GradeCalculator.calcular_promedio_nota(nota)
+                promedio_final = promedio_nota(nota)
             
             curso_data = {
                 "id": curso.id,
                 "nombre": curso.nombre,
-                "docente_nombre": f"{curso.docente.first_name} {curso.docente.last_name}",
+                "docente_nombre": curso.docente.full_name,
                 "ciclo_nombre": curso.ciclo.nombre,
                 "ciclo_año": curso.ciclo.año,
                 "promedio_final": float(promedio_final) if promedio_final is not None else None,
-                "estado": "APROBADO" if promedio_final and float(promedio_final) >= 13 else "DESAPROBADO" if promedio_final else "PENDIENTE",
+                "estado": estado_promedio(promedio_final),
                 "tiene_notas": nota is not None
             }
             
             cursos_response.append(curso_data)
-        
-        return cursos_response
+
+        return RespuestaORJSON(cursos_response)
         
     except Exception as e:
-        print(f"Error in get_student_courses_with_grades: {e}")
+        logger.error(f"Error in get_student_courses_with_grades: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener los cursos con calificaciones"
@@ -783,24 +798,32 @@ def get_evaluation_description(
     """Obtener la descripción de una evaluación específica para un estudiante"""
     
     try:
-        # Verificar que el estudiante tenga notas en el curso (lo que indica que está matriculado)
-        nota_estudiante = db.query(Nota).filter(
+        # Un solo round trip: EXISTS de la matrícula (tener notas en el curso)
+        # junto con la descripción vía LEFT JOIN desde una fila constante,
+        # en lugar de una consulta de verificación y otra de datos
+        tiene_notas = db.query(Nota.id).filter(
             Nota.estudiante_id == current_user.id,
             Nota.curso_id == curso_id
+        ).exists()
+        una_fila = db.query(literal(1).label('uno')).subquery()
+
+        fila = db.query(
+            tiene_notas.label('matriculado'),
+            DescripcionEvaluacion
+        ).select_from(una_fila).outerjoin(
+            DescripcionEvaluacion, and_(
+                DescripcionEvaluacion.curso_id == curso_id,
+                DescripcionEvaluacion.tipo_evaluacion == tipo_evaluacion
+            )
         ).first()
-        
-        if not nota_estudiante:
+
+        if not fila.matriculado:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No tienes acceso a este curso o el curso no existe"
             )
-        
-        # Obtener la descripción de la evaluación
-        descripcion = db.query(DescripcionEvaluacion).filter(
-            DescripcionEvaluacion.curso_id == curso_id,
-            DescripcionEvaluacion.tipo_evaluacion == tipo_evaluacion
-        ).first()
-        
+
+        descripcion = fila.DescripcionEvaluacion
         if not descripcion:
             # Si no hay descripción, devolver información básica
             return {
@@ -826,7 +849,7 @@ def get_evaluation_description(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in get_evaluation_description: {e}")
+        logger.error(f"Error in get_evaluation_description: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener la descripción de la evaluación"
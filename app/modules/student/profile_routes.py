@@ -1,3 +1,5 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 from typing import Optional
@@ -7,6 +9,8 @@ from ..auth.dependencies import get_estudiante_user
 from ..auth.models import User
 from .schemas import EstudianteResponse
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Estudiante - Perfil"])
 
 @router.get("/profile", response_model=EstudianteResponse)
@@ -52,7 +56,7 @@ def get_student_profile(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in get_student_profile: {e}")
+        logger.error(f"Error in get_student_profile: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener el perfil del estudiante"
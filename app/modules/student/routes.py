@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+
+import numpy as np
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import and_, case, func
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 
 from ...database import get_db
 from ..auth.dependencies import get_estudiante_user
 from ..auth.models import User
-from .models import Ciclo, Curso, Nota
+from .models import Curso, Nota
 from .schemas import EstudianteDashboard, RendimientoAcademicoCiclo, RendimientoCicloDetallado
 from ...shared.models import Matricula
+from ...shared.respuesta_orjson import RespuestaORJSON
+from . import cache_respuestas
+from ...shared.carga_estricta import opciones_estrictas
+from ...shared.grade_cache import CAMPOS_NOTA, promedio_nota
 from ...shared.grade_calculator import GradeCalculator
 
 # Importar los routers de los módulos separados
@@ -18,8 +27,21 @@ from .profile_routes import router as profile_router
 
 router = APIRouter(prefix="/student", tags=["Estudiante - Dashboard"])
 
+# Claves de los mapas de calificaciones por categoría, precalculadas una vez
+# en lugar de formatear f"evaluacion{i}" por cada nota del bucle
+_CLAVES_EVALUACIONES = tuple(f'evaluacion{i}' for i in range(1, 9))
+_CLAVES_PRACTICAS = tuple(f'practica{i}' for i in range(1, 5))
+_CLAVES_PARCIALES = tuple(f'parcial{i}' for i in range(1, 3))
+
+# Mapas vacíos compartidos para cursos sin nota: todos los cursos "Pendiente"
+# serializan el mismo contenido, así que se reutiliza un único dict por
+# categoría en lugar de construirlo en cada iteración (orjson solo los lee)
+_SIN_EVALUACIONES = dict.fromkeys(_CLAVES_EVALUACIONES)
+_SIN_PRACTICAS = dict.fromkeys(_CLAVES_PRACTICAS)
+_SIN_PARCIALES = dict.fromkeys(_CLAVES_PARCIALES)
+
 # Endpoint de rendimiento académico con autenticación y cursos detallados
-@router.get("/academic-performance", response_model=List[RendimientoCicloDetallado])
+@router.get("/academic-performance", response_class=RespuestaORJSON, response_model=List[RendimientoCicloDetallado])
 def get_academic_performance(
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db)
@@ -32,7 +54,7 @@ def get_academic_performance(
         
         # Obtener todas las matrículas del estudiante con información del ciclo
         matriculas = db.query(Matricula).options(
-            joinedload(Matricula.ciclo)
+            *opciones_estrictas(joinedload(Matricula.ciclo))
         ).filter(
             Matricula.estudiante_id == estudiante_id,
             Matricula.is_active == True
@@ -40,58 +62,80 @@ def get_academic_performance(
         
         if not matriculas:
             return []
-        
+
+        ciclo_ids = [matricula.ciclo_id for matricula in matriculas]
+
+        # Un solo viaje para todos los ciclos: cursos con su nota (si existe)
+        # vía LEFT JOIN, en lugar de dos consultas por cada matrícula
+        filas = db.query(Curso, Nota).options(
+            *opciones_estrictas()
+        ).outerjoin(
+            Nota, and_(
+                Nota.curso_id == Curso.id,
+                Nota.estudiante_id == estudiante_id
+            )
+        ).filter(
+            Curso.ciclo_id.in_(ciclo_ids),
+            Curso.is_active == True
+        ).all()
+
+        cursos_por_ciclo = defaultdict(list)
+        for curso, nota in filas:
+            cursos_por_ciclo[curso.ciclo_id].append((curso, nota))
+
+        # Promedio por ciclo agregado en SQL (AVG con GROUP BY sobre el
+        # promedio persistido). Solo se usa si todas las notas del ciclo
+        # tienen promedio_final; si hay filas anteriores a la columna, el
+        # ciclo cae al promedio en Python sobre los valores ya calculados
+        agregados_ciclo = db.query(
+            Curso.ciclo_id,
+            func.avg(Nota.promedio_final),
+            func.sum(case((and_(Nota.id.isnot(None), Nota.promedio_final.is_(None)), 1), else_=0))
+        ).outerjoin(
+            Nota, and_(
+                Nota.curso_id == Curso.id,
+                Nota.estudiante_id == estudiante_id
+            )
+        ).filter(
+            Curso.ciclo_id.in_(ciclo_ids),
+            Curso.is_active == True
+        ).group_by(Curso.ciclo_id).all()
+
+        promedios_ciclo_sql = {
+            fila_ciclo_id: round(float(promedio_sql), 2)
+            for fila_ciclo_id, promedio_sql, sin_persistir in agregados_ciclo
+            if promedio_sql is not None and not sin_persistir
+        }
+
         performance_data = []
-        calculator = GradeCalculator()
-        
+
         for matricula in matriculas:
-            # Obtener todos los cursos del ciclo
-            cursos_ciclo = db.query(Curso).filter(
-                Curso.ciclo_id == matricula.ciclo_id,
-                Curso.is_active == True
-            ).all()
-            
-            # Obtener las notas del estudiante para los cursos de este ciclo
-            notas_ciclo = db.query(Nota).options(
-                joinedload(Nota.curso)
-            ).filter(
-                Nota.estudiante_id == estudiante_id,
-                Nota.curso_id.in_([curso.id for curso in cursos_ciclo]) if cursos_ciclo else []
-            ).all()
-            
-            # Crear diccionario de notas por curso
-            notas_por_curso = {nota.curso_id: nota for nota in notas_ciclo}
-            
             # Procesar cada curso del ciclo
             cursos_rendimiento = []
-            
-            for curso in cursos_ciclo:
-                nota = notas_por_curso.get(curso.id)
-                
+
+            for curso, nota in cursos_por_ciclo[matricula.ciclo_id]:
+
                 if nota:
-                    # Calcular promedio final
+                    # Promedio final memorizado por (id, updated_at)
                     try:
-                        promedio_final = calculator.calcular_promedio_nota(nota)
+                        promedio_final = promedio_nota(nota)
                     except Exception as e:
                         promedio_final = None
                     
-                    # Preparar evaluaciones
-                    evaluaciones = {}
-                    for i in range(1, 9):
-                        eval_val = getattr(nota, f'evaluacion{i}')
-                        evaluaciones[f'evaluacion{i}'] = float(eval_val) if eval_val is not None else None
-                    
-                    # Preparar prácticas
-                    practicas = {}
-                    for i in range(1, 5):
-                        prac_val = getattr(nota, f'practica{i}')
-                        practicas[f'practica{i}'] = float(prac_val) if prac_val is not None else None
-                    
-                    # Preparar parciales
-                    parciales = {}
-                    for i in range(1, 3):
-                        parc_val = getattr(nota, f'parcial{i}')
-                        parciales[f'parcial{i}'] = float(parc_val) if parc_val is not None else None
+                    # Mapas por categoría: zip de las claves precalculadas
+                    # con las tuplas agrupadas de la nota
+                    evaluaciones = dict(zip(_CLAVES_EVALUACIONES, (
+                        float(valor) if valor is not None else None
+                        for valor in nota.valores_evaluaciones
+                    )))
+                    practicas = dict(zip(_CLAVES_PRACTICAS, (
+                        float(valor) if valor is not None else None
+                        for valor in nota.valores_practicas
+                    )))
+                    parciales = dict(zip(_CLAVES_PARCIALES, (
+                        float(valor) if valor is not None else None
+                        for valor in nota.valores_parciales
+                    )))
                     
                     # Determinar estado basado en las notas completadas
                     if promedio_final and float(promedio_final) >= 13.0:
@@ -110,9 +154,9 @@ def get_academic_performance(
                 else:
                     # Curso sin notas
                     promedio_final = None
-                    evaluaciones = {f'evaluacion{i}': None for i in range(1, 9)}
-                    practicas = {f'practica{i}': None for i in range(1, 5)}
-                    parciales = {f'parcial{i}': None for i in range(1, 3)}
+                    evaluaciones = _SIN_EVALUACIONES
+                    practicas = _SIN_PRACTICAS
+                    parciales = _SIN_PARCIALES
                     estado = "Pendiente"
                 
                 curso_rendimiento = {
@@ -130,9 +174,12 @@ def get_academic_performance(
             # Calcular estadísticas del ciclo
             numero_cursos = len(cursos_rendimiento)
             
-            # Calcular promedio del ciclo (solo cursos con promedio final)
-            promedios_validos = [curso["promedio_final"] for curso in cursos_rendimiento if curso["promedio_final"] is not None]
-            promedio_ciclo = sum(promedios_validos) / len(promedios_validos) if promedios_validos else None
+            # Promedio del ciclo (solo cursos con promedio final): primero el
+            # agregado de la BD, con fallback en Python para notas legadas
+            promedio_ciclo = promedios_ciclo_sql.get(matricula.ciclo_id)
+            if promedio_ciclo is None:
+                promedios_validos = [curso["promedio_final"] for curso in cursos_rendimiento if curso["promedio_final"] is not None]
+                promedio_ciclo = round(sum(promedios_validos) / len(promedios_validos), 2) if promedios_validos else None
             
             # Crear el objeto de datos de rendimiento del ciclo
             ciclo_data = {
@@ -140,7 +187,7 @@ def get_academic_performance(
                 "ciclo_nombre": matricula.ciclo.nombre,
                 "ciclo_numero": matricula.ciclo.numero,
                 "numero_cursos": numero_cursos,
-                "promedio_ciclo": round(promedio_ciclo, 2) if promedio_ciclo else None,
+                "promedio_ciclo": promedio_ciclo,
                 "ciclo_info": {
                     "id": matricula.ciclo.id,
                     "nombre": matricula.ciclo.nombre,
@@ -153,8 +200,9 @@ def get_academic_performance(
         
         # Ordenar por número de ciclo
         performance_data.sort(key=lambda x: x["ciclo_info"]["numero"])
-        
-        return performance_data
+
+        # Serializar directo con orjson (C), sin revalidar los dicts con Pydantic
+        return RespuestaORJSON(performance_data)
         
     except Exception as e:
         raise HTTPException(
@@ -168,7 +216,7 @@ router.include_router(courses_router)
 router.include_router(schedule_router)
 router.include_router(profile_router)
 
-@router.get("/dashboard", response_model=EstudianteDashboard)
+@router.get("/dashboard", response_class=RespuestaORJSON, response_model=EstudianteDashboard)
 def get_student_dashboard(
     current_user: User = Depends(get_estudiante_user),
     db: Session = Depends(get_db)
@@ -176,6 +224,13 @@ def get_student_dashboard(
     """Obtener dashboard completo del estudiante - CON CAMPOS CORRECTOS"""
     
     try:
+        # Respuesta cacheada: validada con el sello de frescura de las notas
+        clave = (current_user.id, "/dashboard", ())
+        sello = cache_respuestas.sello_notas(db, current_user.id)
+        cuerpo = cache_respuestas.obtener(clave, sello)
+        if cuerpo is not None:
+            return Response(content=cuerpo, media_type="application/json")
+
         # Información básica del estudiante
         estudiante_info = {
             "first_name": current_user.first_name,
@@ -184,12 +239,22 @@ def get_student_dashboard(
             "dni": current_user.dni
         }
 
-        # Obtener la última matrícula del estudiante para determinar el ciclo actual
-        latest_matricula = db.query(Matricula).join(Ciclo).filter(
-            Matricula.estudiante_id == current_user.id
-        ).order_by(Ciclo.numero.desc()).first()
+        # Una sola consulta para las matrículas activas con su ciclo: de aquí
+        # salen tanto el ciclo actual (el de mayor número) como los ciclos de
+        # las estadísticas de carrera, en lugar de dos consultas separadas.
+        # Un estudiante sin matrículas corta aquí sin tocar más la BD
+        matriculas_activas = db.query(Matricula).options(
+            *opciones_estrictas(joinedload(Matricula.ciclo))
+        ).filter(
+            Matricula.estudiante_id == current_user.id,
+            Matricula.is_active == True
+        ).all()
 
-        ciclo_actual = latest_matricula.ciclo if latest_matricula else None
+        ciclo_actual = max(
+            (matricula.ciclo for matricula in matriculas_activas),
+            key=lambda ciclo: ciclo.numero,
+            default=None
+        )
 
         if not ciclo_actual:
             return {
@@ -206,24 +271,34 @@ def get_student_dashboard(
             }
 
         # Cursos actuales basados en el ciclo de la última matrícula
-        cursos_actuales = db.query(Curso).options(joinedload(Curso.docente)).filter(
+        cursos_actuales = db.query(Curso).options(
+            *opciones_estrictas(joinedload(Curso.docente))
+        ).filter(
             Curso.ciclo_id == ciclo_actual.id
         ).all()
 
+        # Todas las notas de los cursos actuales en un solo viaje (hay a lo
+        # sumo una por curso), indexadas por curso
+        curso_ids_actuales = [curso.id for curso in cursos_actuales]
+        notas_actuales = {}
+        if curso_ids_actuales:
+            notas_actuales = {
+                nota.curso_id: nota
+                for nota in db.query(Nota).options(*opciones_estrictas()).filter(
+                    Nota.estudiante_id == current_user.id,
+                    Nota.curso_id.in_(curso_ids_actuales)
+                )
+            }
+
         cursos_formateados = []
-        calculator = GradeCalculator()
         for curso in cursos_actuales:
-            # Obtener la nota del estudiante para el curso actual
-            nota = db.query(Nota).filter(
-                Nota.estudiante_id == current_user.id,
-                Nota.curso_id == curso.id
-            ).first()
+            nota = notas_actuales.get(curso.id)
 
             promedio_curso = None
             if nota:
                 try:
-                    # Usar el calculador para obtener el promedio
-                    promedio_curso = calculator.calcular_promedio_final(nota)
+                    # Promedio memorizado por (id, updated_at)
+                    promedio_curso = promedio_nota(nota)
                 except Exception:
                     promedio_curso = None
             
@@ -240,13 +315,16 @@ def get_student_dashboard(
 
         # Notas recientes - VERSIÓN CORREGIDA (SIN JOIN PROBLEMÁTICO)
         curso_ids = [curso.id for curso in cursos_actuales]
-        notas_recientes = db.query(Nota).filter(
+        notas_recientes = db.query(Nota).options(
+            *opciones_estrictas(joinedload(Nota.curso).joinedload(Curso.docente))
+        ).filter(
             Nota.estudiante_id == current_user.id,
             Nota.curso_id.in_(curso_ids)
         ).order_by(Nota.updated_at.desc()).limit(5).all()
         
         notas_formateadas = []
         for nota in notas_recientes:
+            promedio_reciente = promedio_nota(nota)
             notas_formateadas.append({
                 "id": nota.id,
                 "curso_nombre": nota.curso.nombre,
@@ -271,74 +349,82 @@ def get_student_dashboard(
                 "parcial1": float(nota.parcial1) if nota.parcial1 else None,
                 "parcial2": float(nota.parcial2) if nota.parcial2 else None,
                 
-                # Calcular promedio final usando el método del modelo
-                "promedio_final": float(nota.calcular_promedio_final()) if nota.calcular_promedio_final() else None,
+                # Promedio memorizado, calculado una sola vez por nota
+                "promedio_final": float(promedio_reciente) if promedio_reciente else None,
                 "estado": nota.obtener_estado(),
-                "fecha_actualizacion": nota.updated_at.isoformat() if nota.updated_at else nota.created_at.isoformat()
+                # orjson serializa datetime nativamente, sin isoformat() por fila
+                "fecha_actualizacion": nota.updated_at if nota.updated_at else nota.created_at
             })
 
         # CALCULAR ESTADÍSTICAS DE TODOS LOS CICLOS (APROBADOS Y DESAPROBADOS A LO LARGO DE TODA LA CARRERA)
-        # Obtener todas las matrículas activas del estudiante
-        matriculas_activas = db.query(Matricula).filter(
-            Matricula.estudiante_id == current_user.id,
-            Matricula.is_active == True
-        ).all()
-        
-        # Obtener cursos de todos los ciclos en los que está matriculado
+        # Ciclos de las matrículas activas ya consultadas al inicio
         ciclo_ids = [matricula.ciclo_id for matricula in matriculas_activas]
-        
-        cursos_todos_ciclos = []
-        if ciclo_ids:
-            cursos_todos_ciclos = db.query(Curso).filter(
-                Curso.ciclo_id.in_(ciclo_ids)
-            ).all()
-        
-        # Calcular estadísticas de todos los ciclos usando GradeCalculator
+
+        total_cursos_carrera = 0
         cursos_aprobados_todos_ciclos = 0
         cursos_desaprobados_todos_ciclos = 0
-        cursos_pendientes_todos_ciclos = 0
-        promedios_todos_ciclos = []
-        
-        for curso in cursos_todos_ciclos:
-            # Obtener notas del curso
-            notas_curso = db.query(Nota).filter(
+        suma_promedios = 0.0
+        cursos_con_promedio = 0
+
+        if ciclo_ids:
+            # Conteo agregado en SQL sobre el promedio persistido: la BD
+            # clasifica y suma, sin materializar cursos ni notas en Python
+            conteos = db.query(
+                func.count(Curso.id),
+                func.sum(case((Nota.promedio_final >= 13, 1), else_=0)),
+                func.sum(case((Nota.promedio_final < 13, 1), else_=0)),
+                func.sum(Nota.promedio_final),
+                func.count(Nota.promedio_final),
+            ).select_from(Curso).outerjoin(
+                Nota, and_(
+                    Nota.curso_id == Curso.id,
+                    Nota.estudiante_id == current_user.id
+                )
+            ).filter(Curso.ciclo_id.in_(ciclo_ids)).first()
+
+            total_cursos_carrera = conteos[0] or 0
+            cursos_aprobados_todos_ciclos = int(conteos[1] or 0)
+            cursos_desaprobados_todos_ciclos = int(conteos[2] or 0)
+            suma_promedios = float(conteos[3] or 0)
+            cursos_con_promedio = int(conteos[4] or 0)
+
+            # Fallback para notas anteriores a la columna persistida: solo se
+            # proyectan las 14 columnas de calificación (sin hidratar entidades
+            # Nota) y las filas alimentan directo al lote vectorizado
+            filas_sin_promedio = db.query(
+                *(getattr(Nota, campo) for campo in CAMPOS_NOTA)
+            ).join(Curso, Nota.curso_id == Curso.id).filter(
                 Nota.estudiante_id == current_user.id,
-                Nota.curso_id == curso.id
+                Curso.ciclo_id.in_(ciclo_ids),
+                Nota.promedio_final.is_(None)
             ).all()
-            
-            if notas_curso:
-                # Usar GradeCalculator para calcular el promedio con los pesos correctos
-                promedio_calculado = None
-                for nota in notas_curso:
-                    try:
-                        promedio_calculado = GradeCalculator.calcular_promedio_nota(nota)
-                        if promedio_calculado is not None:
-                            break
-                    except Exception:
-                        continue
-                
-                if promedio_calculado is not None:
-                    promedio_float = float(promedio_calculado)
-                    promedios_todos_ciclos.append(promedio_float)
-                    
-                    if promedio_float >= 13.0:
-                        cursos_aprobados_todos_ciclos += 1
-                    else:
-                        cursos_desaprobados_todos_ciclos += 1
-                else:
-                    cursos_pendientes_todos_ciclos += 1
-            else:
-                cursos_pendientes_todos_ciclos += 1
-        
+
+            promedios_fallback = [
+                promedio for promedio in GradeCalculator.promedios_lote(filas_sin_promedio)
+                if promedio is not None
+            ]
+            if promedios_fallback:
+                # Suma y clasificación vectorizadas sobre el lote completo
+                arr = np.asarray(promedios_fallback)
+                aprobados_fallback = int((arr >= 13.0).sum())
+                suma_promedios += float(arr.sum())
+                cursos_con_promedio += arr.size
+                cursos_aprobados_todos_ciclos += aprobados_fallback
+                cursos_desaprobados_todos_ciclos += arr.size - aprobados_fallback
+
+        cursos_pendientes_todos_ciclos = (
+            total_cursos_carrera - cursos_aprobados_todos_ciclos - cursos_desaprobados_todos_ciclos
+        )
+
         # Calcular promedio general de todos los ciclos
-        promedio_general_todos_ciclos = round(sum(promedios_todos_ciclos) / len(promedios_todos_ciclos), 2) if promedios_todos_ciclos else 0
+        promedio_general_todos_ciclos = round(suma_promedios / cursos_con_promedio, 2) if cursos_con_promedio else 0
         
         # Calcular créditos completados de todos los ciclos
         creditos_completados_todos_ciclos = cursos_aprobados_todos_ciclos * 3
 
         # DEFINIR LAS ESTADÍSTICAS (SOLO DE TODA LA CARRERA)
         estadisticas = {
-            "total_cursos_carrera": len(cursos_todos_ciclos),
+            "total_cursos_carrera": total_cursos_carrera,
             "promedio_general_carrera": promedio_general_todos_ciclos,
             "cursos_aprobados_carrera": cursos_aprobados_todos_ciclos,
             "cursos_desaprobados_carrera": cursos_desaprobados_todos_ciclos,
@@ -346,12 +432,15 @@ def get_student_dashboard(
             "creditos_completados_carrera": creditos_completados_todos_ciclos
         }
 
-        return {
+        # Serializar directo con orjson (C), sin revalidar los dicts con Pydantic
+        cuerpo = orjson.dumps({
             "estudiante_info": estudiante_info,
             "cursos_actuales": cursos_formateados,
             "notas_recientes": notas_formateadas,
             "estadisticas": estadisticas
-        }
+        })
+        cache_respuestas.guardar(clave, sello, cuerpo)
+        return Response(content=cuerpo, media_type="application/json")
 
     except Exception as e:
         return {
@@ -1,5 +1,7 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, aliased
 from typing import List, Optional
 
 from ...database import get_db
@@ -7,6 +9,8 @@ from ..auth.dependencies import get_estudiante_user
 from ..auth.models import User
 from .models import Carrera, Ciclo, Curso, Matricula
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Estudiante - Horario"])
 
 @router.get("/schedule")
@@ -19,55 +23,65 @@ def get_student_schedule(
     """Obtener horario del estudiante"""
     
     try:
-        # Obtener matrículas activas del estudiante
-        matriculas_query = db.query(Matricula).join(Ciclo).filter(
+        # Ciclos matriculados como subconsulta: el optimizador la resuelve
+        # como semi-join, así el horario completo sale en un solo round trip
+        ciclos_query = db.query(Matricula.ciclo_id).join(
+            Ciclo, Matricula.ciclo_id == Ciclo.id
+        ).filter(
             Matricula.estudiante_id == current_user.id,
             Matricula.is_active == True
         )
-        
+
         # Aplicar filtros
         if año:
-            matriculas_query = matriculas_query.filter(Ciclo.año == año)
-        
+            ciclos_query = ciclos_query.filter(Ciclo.año == año)
+
         if ciclo_id:
-            matriculas_query = matriculas_query.filter(Matricula.ciclo_id == ciclo_id)
-        
-        matriculas_activas = matriculas_query.all()
-        
-        # Obtener cursos de los ciclos en los que está matriculado
-        ciclo_ids = [matricula.ciclo_id for matricula in matriculas_activas]
-        
-        if not ciclo_ids:
-            return []
-        
-        cursos = db.query(Curso).filter(
-            Curso.ciclo_id.in_(ciclo_ids),
+            ciclos_query = ciclos_query.filter(Matricula.ciclo_id == ciclo_id)
+
+        ciclos_subq = ciclos_query.scalar_subquery()
+
+        # Proyectar solo las columnas que usa la respuesta, sin hidratar
+        # entidades Curso/Ciclo/Carrera/User completas
+        Docente = aliased(User)
+        filas = db.query(
+            Curso.id,
+            Curso.nombre.label('curso_nombre'),
+            Docente.full_name.label('docente_nombre'),
+            Ciclo.nombre.label('ciclo_nombre'),
+            Ciclo.año.label('ciclo_año'),
+            Carrera.nombre.label('carrera_nombre')
+        ).join(
+            Ciclo, Curso.ciclo_id == Ciclo.id
+        ).outerjoin(
+            Carrera, Ciclo.carrera_id == Carrera.id
+        ).join(
+            Docente, Curso.docente_id == Docente.id
+        ).filter(
+            Curso.ciclo_id.in_(ciclos_subq),
             Curso.is_active == True
-        ).options(
-            joinedload(Curso.ciclo).joinedload(Ciclo.carrera),
-            joinedload(Curso.docente)
         ).all()
-        
+
         # Convertir a formato de horario
         horario_response = []
-        for curso in cursos:
+        for fila in filas:
             horario_data = {
-                "id": curso.id,
-                "curso_nombre": curso.nombre,
-                "docente_nombre": f"{curso.docente.first_name} {curso.docente.last_name}",
-                "ciclo_nombre": curso.ciclo.nombre,
-                "ciclo_año": curso.ciclo.año,
+                "id": fila.id,
+                "curso_nombre": fila.curso_nombre,
+                "docente_nombre": fila.docente_nombre,
+                "ciclo_nombre": fila.ciclo_nombre,
+                "ciclo_año": fila.ciclo_año,
                 "horario": None,  # Campo no implementado aún
                 "aula": None,     # Campo no implementado aún
-                "carrera_nombre": curso.ciclo.carrera.nombre if curso.ciclo.carrera else None
+                "carrera_nombre": fila.carrera_nombre
             }
-            
+
             horario_response.append(horario_data)
         
         return horario_response
         
     except Exception as e:
-        print(f"Error in get_student_schedule: {e}")
+        logger.error(f"Error in get_student_schedule: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener el horario del estudiante"
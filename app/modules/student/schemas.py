@@ -1,31 +1,58 @@
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from functools import cached_property
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, computed_field, conlist
+from pydantic.dataclasses import dataclass
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime, date
-from decimal import Decimal
 
-# Schemas específicos para el Dashboard
-class EstudianteInfo(BaseModel):
+# Estados posibles de las calificaciones (pydantic-core valida Literal por
+# comparación interna, más barato que un str libre, y documenta el enum en
+# OpenAPI). El rendimiento académico usa su propio contrato con otro casing
+EstadoNota = Literal["APROBADO", "DESAPROBADO", "PENDIENTE", "SIN_NOTAS"]
+EstadoRendimiento = Literal["Aprobado", "Desaprobado", "En curso", "Pendiente"]
+
+# Construcción diferida del core schema: los modelos que ninguna petición
+# toca en la vida de un worker no pagan su compilación al importar. Los que
+# aparecen en rutas o en el adaptador del final se construyen igual al
+# registrarse, pero el resto solo si se usa
+_CONFIG_DIFERIDA = ConfigDict(defer_build=True)
+# Para los esquemas *Base y sus derivados: son objetos de valor que nunca se
+# mutan tras construirse; frozen=True lo hace explícito (y los vuelve
+# hasheables). No se convierten en dataclasses porque sus subclases Response
+# necesitan seguir siendo BaseModel (from_attributes, response_model)
+_CONFIG_CONGELADA = ConfigDict(defer_build=True, frozen=True)
+_CONFIG_ORM_DIFERIDA = ConfigDict(from_attributes=True, defer_build=True)
+# Para los tipos compuestos (dashboard, curso con notas): los sub-modelos ya
+# llegan validados, así que se fija revalidate_instances='never' para que
+# pydantic no vuelva a recorrer sus campos al validar el contenedor, y
+# extra='ignore' evita iterar claves desconocidas del dict de entrada
+_CONFIG_ORM_COMPUESTA = ConfigDict(
+    from_attributes=True,
+    defer_build=True,
+    extra='ignore',
+    revalidate_instances='never',
+)
+
+# Schemas específicos para el Dashboard.
+# Los DTO puros (sin validadores y nunca mutados tras construirse) van como
+# dataclasses de pydantic con slots: sin __dict__ por instancia y
+# construcción más barata que un BaseModel completo
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class EstudianteInfo:
     first_name: str
     last_name: str
     email: str
     dni:str
     codigo_estudiante: Optional[str] = None
 
-class CursoDashboard(BaseModel):
-    id: int
-    nombre: str
-    docente_nombre: str
-    ciclo_nombre: str
-    creditos: Optional[int] = 3
+# Bloque de los 14 campos de calificación declarado una sola vez: pydantic
+# compila el sub-esquema del mixin y lo comparte entre los modelos que lo
+# heredan. Van planos a propósito: el frontend lee las claves
+# evaluacionN/practicaN/parcialN directamente del JSON, así que no pueden
+# agruparse en listas sin romper el contrato de la API
+class _CamposNota(BaseModel):
+    model_config = _CONFIG_DIFERIDA
 
-class NotaDashboard(BaseModel):
-    """Esquema simplificado para el dashboard - USANDO CAMPOS REALES"""
-    id: int
-    curso_nombre: str
-    docente_nombre: str
-    ciclo_nombre: str
-    
-    # SOLO CAMPOS QUE EXISTEN EN EL MODELO
     evaluacion1: Optional[float] = None
     evaluacion2: Optional[float] = None
     evaluacion3: Optional[float] = None
@@ -34,21 +61,40 @@ class NotaDashboard(BaseModel):
     evaluacion6: Optional[float] = None
     evaluacion7: Optional[float] = None
     evaluacion8: Optional[float] = None
-    
+
     practica1: Optional[float] = None
     practica2: Optional[float] = None
     practica3: Optional[float] = None
     practica4: Optional[float] = None
-    
+
     parcial1: Optional[float] = None
     parcial2: Optional[float] = None
-    
+
+class CursoDashboard(BaseModel):
+    model_config = _CONFIG_DIFERIDA
+
+    id: int
+    nombre: str
+    docente_nombre: str
+    ciclo_nombre: str
+    creditos: Optional[int] = 3
+
+class NotaDashboard(_CamposNota):
+    """Esquema simplificado para el dashboard - USANDO CAMPOS REALES"""
+    id: int
+    curso_nombre: str
+    docente_nombre: str
+    ciclo_nombre: str
+
     promedio_final: Optional[float] = None
-    estado: Optional[str] = None
-    
-    fecha_actualizacion: str
+    estado: Optional[EstadoNota] = None
 
-class EstadisticasDashboard(BaseModel):
+    # datetime nativo: pydantic-core y orjson lo serializan directo,
+    # sin isoformat() en Python por fila
+    fecha_actualizacion: datetime
+
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class EstadisticasDashboard:
     total_cursos_carrera: int
     promedio_general_carrera: float
     cursos_aprobados_carrera: int
@@ -59,6 +105,8 @@ class EstadisticasDashboard(BaseModel):
 
 # Schemas para Carrera
 class CarreraBase(BaseModel):
+    model_config = _CONFIG_CONGELADA
+
     nombre: str
     codigo: str
     descripcion: Optional[str] = None
@@ -69,11 +117,12 @@ class CarreraResponse(CarreraBase):
     is_active: bool
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_DIFERIDA
 
 # Schemas para Ciclo
 class CicloBase(BaseModel):
+    model_config = _CONFIG_CONGELADA
+
     nombre: str
     descripcion: Optional[str] = None
     fecha_inicio: datetime
@@ -85,11 +134,12 @@ class CicloResponse(CicloBase):
     is_active: bool
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_DIFERIDA
 
 # Schemas para Curso
 class CursoBase(BaseModel):
+    model_config = _CONFIG_CONGELADA
+
     nombre: str
     horario: Optional[str] = None
     aula: Optional[str] = None
@@ -107,8 +157,7 @@ class CursoResponse(CursoBase):
     carrera: Optional[CarreraResponse] = None
     ciclo: Optional[CicloResponse] = None
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_DIFERIDA
 
 class CursoEstudianteResponse(BaseModel):
     """Información del curso desde la perspectiva del estudiante"""
@@ -124,11 +173,12 @@ class CursoEstudianteResponse(BaseModel):
     aula: Optional[str] = None
     carrera_nombre: Optional[str] = None
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_DIFERIDA
 
 # Schemas para Matrícula
 class MatriculaBase(BaseModel):
+    model_config = _CONFIG_CONGELADA
+
     ciclo_id: int
 
 class MatriculaCreate(MatriculaBase):
@@ -143,8 +193,7 @@ class MatriculaResponse(MatriculaBase):
     # Información relacionada
     ciclo: Optional[CicloResponse] = None
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_DIFERIDA
 
 
 # para el dashboard
@@ -152,25 +201,32 @@ class CursoConNotasResponse(BaseModel):
     """Curso con todas sus notas - SISTEMA NUEVO"""
     curso: 'CursoEstudianteResponse'
     notas: List['NotaEstudianteResponse']
-    promedio_final: Optional[Decimal] = None
-    estado: Optional[str] = None
-    
-    class Config:
-        from_attributes = True
+    estado: Optional[EstadoNota] = None
+
+    model_config = _CONFIG_ORM_COMPUESTA
+
+    # Campo derivado de las notas y memorizado por instancia: se calcula a
+    # lo sumo una vez aunque el objeto se serialice varias veces
+    @computed_field
+    @cached_property
+    def promedio_final(self) -> Optional[float]:
+        valores = [nota.promedio_final for nota in self.notas if nota.promedio_final is not None]
+        if not valores:
+            return None
+        return round(sum(valores) / len(valores), 2)
 
 class PromedioFinalEstudianteResponse(BaseModel):
     """Promedio final del estudiante en un curso"""
     curso_id: int
     curso_nombre: str
-    promedio_final: Decimal
-    estado: str  # APROBADO, DESAPROBADO, SIN_NOTAS
+    promedio_final: float
+    estado: EstadoNota
     detalle: dict
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_DIFERIDA
 
 # Schemas para Notas - SISTEMA NUEVO
-class NotaEstudianteResponse(BaseModel):
+class NotaEstudianteResponse(_CamposNota):
     """Vista de notas desde la perspectiva del estudiante - SISTEMA NUEVO"""
     id: int
     curso_id: int
@@ -178,39 +234,32 @@ class NotaEstudianteResponse(BaseModel):
     docente_nombre: str
     ciclo_nombre: Optional[str] = None
     ciclo_año: Optional[int] = None
-    
+
     # Promedios por tipo de evaluación
     promedio_evaluaciones: Optional[float] = None
     promedio_practicas: Optional[float] = None
     promedio_parciales: Optional[float] = None
-    
+
     # Promedio final ponderado
     promedio_final: Optional[float] = None
-    estado: Optional[str] = None
-    
-    # Notas individuales
-    evaluacion1: Optional[float] = None
-    evaluacion2: Optional[float] = None
-    evaluacion3: Optional[float] = None
-    evaluacion4: Optional[float] = None
-    evaluacion5: Optional[float] = None
-    evaluacion6: Optional[float] = None
-    evaluacion7: Optional[float] = None
-    evaluacion8: Optional[float] = None
-    
-    practica1: Optional[float] = None
-    practica2: Optional[float] = None
-    practica3: Optional[float] = None
-    practica4: Optional[float] = None
-    
-    parcial1: Optional[float] = None
-    parcial2: Optional[float] = None
-    
+    estado: Optional[EstadoNota] = None
+
     fecha_registro: Optional[date] = None
     observaciones: Optional[str] = None
-    
-    class Config:
-        from_attributes = True
+
+    model_config = _CONFIG_ORM_DIFERIDA
+
+class EvaluacionItem(BaseModel):
+    """Una calificación individual dentro de su categoría
+
+    Claves conocidas en lugar de Dict[str, Any]: pydantic-core valida con
+    su esquema de campos fijos en vez del camino genérico de mapas.
+    """
+    model_config = _CONFIG_DIFERIDA
+
+    numero: int
+    nota: float
+    tipo: str
 
 class NotaDetalladaResponse(BaseModel):
     """Nota con todos los campos detallados"""
@@ -218,26 +267,25 @@ class NotaDetalladaResponse(BaseModel):
     curso_id: int
     curso_nombre: str
     docente_nombre: str
-    
+
     # Promedios por tipo de evaluación
     promedio_evaluaciones: Optional[float] = None
     promedio_practicas: Optional[float] = None
     promedio_parciales: Optional[float] = None
-    
+
     # Promedio final ponderado
     promedio_final: Optional[float] = None
-    estado: Optional[str] = None
-    
+    estado: Optional[EstadoNota] = None
+
     # Notas individuales detalladas
-    evaluaciones: List[Dict[str, Any]] = []  # Lista de evaluaciones semanales
-    practicas: List[Dict[str, Any]] = []     # Lista de prácticas
-    parciales: List[Dict[str, Any]] = []     # Lista de parciales
+    evaluaciones: List[EvaluacionItem] = []  # Lista de evaluaciones semanales
+    practicas: List[EvaluacionItem] = []     # Lista de prácticas
+    parciales: List[EvaluacionItem] = []     # Lista de parciales
     
     fecha_registro: Optional[datetime] = None
     observaciones: Optional[str] = None
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_DIFERIDA
       
 class NotasPorTipoResponse(BaseModel):
     """Notas agrupadas por tipo de evaluación - SISTEMA NUEVO"""
@@ -249,11 +297,10 @@ class NotasPorTipoResponse(BaseModel):
     evaluaciones_practicas: List[NotaEstudianteResponse] = Field(default_factory=list)
     evaluaciones_parciales: List[NotaEstudianteResponse] = Field(default_factory=list)
     
-    promedio_final: Optional[Decimal] = None
-    estado: Optional[str] = None
+    promedio_final: Optional[float] = None
+    estado: Optional[EstadoNota] = None
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_COMPUESTA
 
 class EstudianteDashboard(BaseModel):
     """Información completa del dashboard del estudiante"""
@@ -262,25 +309,22 @@ class EstudianteDashboard(BaseModel):
     notas_recientes: List[NotaDashboard]
     estadisticas: EstadisticasDashboard
     
-    class Config:
-        from_attributes = True
+    model_config = _CONFIG_ORM_COMPUESTA
 
 class EstadisticasEstudiante(BaseModel):
     """Estadísticas del rendimiento del estudiante"""
     total_cursos: int
-    promedio_general: Optional[Decimal] = None
+    promedio_general: Optional[float] = None
     cursos_aprobados: int
     cursos_desaprobados: int
     creditos_completados: int
     
-    class Config:
-        from_attributes = True
-
-# Forward references
-CursoConNotasResponse.update_forward_refs()
+    model_config = _CONFIG_ORM_DIFERIDA
 
 # Schema para respuesta del perfil del estudiante
 class EstudianteResponse(BaseModel):
+    model_config = _CONFIG_DIFERIDA
+
     id: int
     user_id: int
     codigo_estudiante: Optional[str] = None
@@ -297,19 +341,16 @@ class EstudianteResponse(BaseModel):
 
 # Schemas para solicitudes de matrícula
 class SolicitudMatricula(BaseModel):
-    cursos_ids: List[int] = Field(..., description="Lista de IDs de cursos para matricularse")
+    model_config = _CONFIG_DIFERIDA
+
+    # Restricciones declarativas (pydantic-core valida mínimo 1 y máximo 8
+    # cursos por ciclo sin pasar por un validador en Python)
+    cursos_ids: conlist(int, min_length=1, max_length=8) = Field(..., description="Lista de IDs de cursos para matricularse")
     ciclo_id: int = Field(..., description="ID del ciclo académico")
-    
-    @validator('cursos_ids')
-    def validate_cursos_ids(cls, v):
-        if not v:
-            raise ValueError('Debe seleccionar al menos un curso')
-        if len(v) > 8:  # Límite máximo de cursos por ciclo
-            raise ValueError('No puede matricularse en más de 8 cursos por ciclo')
-        return v
 
 # Schemas para rendimiento académico
-class RendimientoAcademicoCiclo(BaseModel):
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class RendimientoAcademicoCiclo:
     ciclo_id: int
     ciclo_nombre: str
     ciclo_numero: int
@@ -317,25 +358,60 @@ class RendimientoAcademicoCiclo(BaseModel):
     numero_cursos: int
     fecha_matricula: Optional[str] = None
 
-class CursoRendimiento(BaseModel):
+# Mapas de calificaciones con claves fijas: mismo JSON que los dicts
+# anteriores pero con esquema de campos conocidos en lugar del validador
+# genérico de mapas, y documentados como tales en OpenAPI
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class MapaEvaluaciones:
+    evaluacion1: Optional[float] = None
+    evaluacion2: Optional[float] = None
+    evaluacion3: Optional[float] = None
+    evaluacion4: Optional[float] = None
+    evaluacion5: Optional[float] = None
+    evaluacion6: Optional[float] = None
+    evaluacion7: Optional[float] = None
+    evaluacion8: Optional[float] = None
+
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class MapaPracticas:
+    practica1: Optional[float] = None
+    practica2: Optional[float] = None
+    practica3: Optional[float] = None
+    practica4: Optional[float] = None
+
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class MapaParciales:
+    parcial1: Optional[float] = None
+    parcial2: Optional[float] = None
+
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class CursoRendimiento:
     curso_id: int
     curso_nombre: str
     promedio_final: Optional[float] = None
-    estado: Optional[str] = None
-    evaluaciones: Optional[Dict[str, Optional[float]]] = None
-    practicas: Optional[Dict[str, Optional[float]]] = None
-    parciales: Optional[Dict[str, Optional[float]]] = None
+    estado: Optional[EstadoRendimiento] = None
+    evaluaciones: Optional[MapaEvaluaciones] = None
+    practicas: Optional[MapaPracticas] = None
+    parciales: Optional[MapaParciales] = None
 
-class CicloInfo(BaseModel):
+@dataclass(frozen=True, slots=True, config=_CONFIG_DIFERIDA)
+class CicloInfo:
     id: int
     nombre: str
     numero: int
 
 class RendimientoCicloDetallado(BaseModel):
+    model_config = _CONFIG_DIFERIDA
+
     ciclo_id: int
     ciclo_nombre: str
     ciclo_numero: int
     numero_cursos: int
     promedio_ciclo: Optional[float] = None
     ciclo_info: CicloInfo
-    cursos: List[CursoRendimiento]
\ No newline at end of file
+    cursos: List[CursoRendimiento]
+
+# Adaptador de lista construido una sola vez al importar el módulo: el
+# recorrido del core schema se paga al arrancar y cada petición solo
+# valida y serializa, sin reconstruir el adaptador
+ADAPTADOR_LISTA_NOTAS = TypeAdapter(List[NotaEstudianteResponse])
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, insert
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
@@ -14,6 +14,7 @@ from ..auth.models import User, RoleEnum
 from .models import Carrera, Ciclo, Curso, Matricula, Nota, HistorialNota, DescripcionEvaluacion
 from app.shared import email_service
 from ...shared.grade_calculator import GradeCalculator
+from ...shared.nota_promedios_mv import refrescar_vista
 from .schemas import (
     NotaCreate, NotaUpdate, NotaDocenteResponse, ActualizacionMasivaNotas,
     NotaResponse, PromedioFinalResponse, EstructuraNotasResponse, NotaMasivaCreate,
@@ -165,7 +166,8 @@ def update_grade(
     db.add(historial)
     db.commit()
     db.refresh(nota)
-    
+    refrescar_vista(db)
+
     return {
         "id": nota.id,
         "estudiante_id": nota.estudiante_id,
@@ -202,15 +204,27 @@ def update_grades_bulk(
     created_count = 0
     updated_count = 0
     errors = []
-    
+
+    # Filas de historial acumuladas durante el bucle y escritas al final en
+    # un solo INSERT multi-fila (insertmanyvalues), en vez de un INSERT por
+    # registro en el flush
+    historial_rows = []
+
+    # Prefetch de las notas existentes del lote en una sola consulta (antes
+    # era un SELECT por estudiante dentro del bucle: N round trips)
+    notas_existentes = {
+        nota.estudiante_id: nota
+        for nota in db.query(Nota).filter(
+            Nota.curso_id == curso_id,
+            Nota.estudiante_id.in_([n.estudiante_id for n in grades_data.notas])
+        ).all()
+    }
+
     for nota_data in grades_data.notas:
         try:
             # Buscar si ya existe una nota para este estudiante y curso
-            nota_existente = db.query(Nota).filter(
-                Nota.estudiante_id == nota_data.estudiante_id,
-                Nota.curso_id == curso_id
-            ).first()
-            
+            nota_existente = notas_existentes.get(nota_data.estudiante_id)
+
             if nota_existente:
                 # Actualizar nota existente
                 # Guardar valores anteriores para historial
@@ -248,18 +262,16 @@ def update_grades_bulk(
                 # Calcular promedio actual para el historial
                 promedio_actual = GradeCalculator.calcular_promedio_nota(nota_existente)
                 
-                # Crear registro en historial
-                historial = HistorialNota(
-                    nota_id=nota_existente.id,
-                    estudiante_id=nota_existente.estudiante_id,
-                    curso_id=nota_existente.curso_id,
-                    nota_anterior=None,  # Para actualizaciones masivas, no guardamos el valor anterior completo
-                    nota_nueva=float(promedio_actual) if promedio_actual is not None else 0.0,
-                    motivo_cambio="ACTUALIZACION_MASIVA",
-                    usuario_modificacion=f"{current_user.first_name} {current_user.last_name}"
-                )
-                
-                db.add(historial)
+                # Registro de historial (se inserta en lote tras el bucle)
+                historial_rows.append({
+                    "nota_id": nota_existente.id,
+                    "estudiante_id": nota_existente.estudiante_id,
+                    "curso_id": nota_existente.curso_id,
+                    "nota_anterior": None,  # Para actualizaciones masivas, no guardamos el valor anterior completo
+                    "nota_nueva": float(promedio_actual) if promedio_actual is not None else 0.0,
+                    "motivo_cambio": "ACTUALIZACION_MASIVA",
+                    "usuario_modificacion": f"{current_user.first_name} {current_user.last_name}"
+                })
                 updated_count += 1
                 
             else:
@@ -287,29 +299,32 @@ def update_grades_bulk(
                 
                 db.add(nueva_nota)
                 db.flush()  # Para obtener el ID
+                # Registrar en el prefetch por si el lote repite al estudiante
+                notas_existentes[nota_data.estudiante_id] = nueva_nota
                 
                 # Calcular promedio de la nueva nota para el historial
                 promedio_nueva = GradeCalculator.calcular_promedio_nota(nueva_nota)
                 
-                # Crear registro en historial
-                historial = HistorialNota(
-                    nota_id=nueva_nota.id,
-                    estudiante_id=nueva_nota.estudiante_id,
-                    curso_id=nueva_nota.curso_id,
-                    nota_anterior=None,
-                    nota_nueva=float(promedio_nueva) if promedio_nueva is not None else 0.0,
-                    motivo_cambio="CREACION_MASIVA",
-                    usuario_modificacion=f"{current_user.first_name} {current_user.last_name}"
-                )
-                
-                db.add(historial)
+                # Registro de historial (se inserta en lote tras el bucle)
+                historial_rows.append({
+                    "nota_id": nueva_nota.id,
+                    "estudiante_id": nueva_nota.estudiante_id,
+                    "curso_id": nueva_nota.curso_id,
+                    "nota_anterior": None,
+                    "nota_nueva": float(promedio_nueva) if promedio_nueva is not None else 0.0,
+                    "motivo_cambio": "CREACION_MASIVA",
+                    "usuario_modificacion": f"{current_user.first_name} {current_user.last_name}"
+                })
                 created_count += 1
             
         except Exception as e:
             errors.append(f"Error procesando nota para estudiante {nota_data.estudiante_id}: {str(e)}")
-    
+
+    if historial_rows:
+        db.execute(insert(HistorialNota), historial_rows)
     db.commit()
-    
+    refrescar_vista(db)
+
     return {
         "message": f"Actualización masiva completada",
         "notas_creadas": created_count,
@@ -386,6 +401,34 @@ def upload_grades_from_excel(
             'PARCIAL1': 'parcial1', 'PARCIAL2': 'parcial2'
         }
         
+        # Prefetch en tres consultas de todo lo que el bucle necesita por fila
+        # (antes: un SELECT de User y otro de Matricula por fila del Excel)
+        dnis = [str(dni).strip() for dni in df['DNI'].tolist()]
+        estudiantes_por_dni = {
+            u.dni: u
+            for u in db.query(User).filter(
+                User.dni.in_(dnis),
+                User.role == RoleEnum.ESTUDIANTE,
+                User.is_active == True
+            ).all()
+        }
+        ids_estudiantes = [u.id for u in estudiantes_por_dni.values()]
+        matriculados = {
+            m.estudiante_id
+            for m in db.query(Matricula).filter(
+                Matricula.estudiante_id.in_(ids_estudiantes),
+                Matricula.ciclo_id == curso.ciclo_id,
+                Matricula.is_active == True
+            ).all()
+        }
+        notas_por_estudiante = {
+            n.estudiante_id: n
+            for n in db.query(Nota).filter(
+                Nota.curso_id == curso_id,
+                Nota.estudiante_id.in_(ids_estudiantes)
+            ).all()
+        }
+
         # Procesar cada fila del Excel
         notas_procesadas = []
         errores = []
@@ -397,24 +440,14 @@ def upload_grades_from_excel(
                 apellido = str(row['APELLIDO']).strip()
                 
                 # Buscar estudiante por DNI
-                estudiante = db.query(User).filter(
-                    User.dni == dni,
-                    User.role == RoleEnum.ESTUDIANTE,
-                    User.is_active == True
-                ).first()
+                estudiante = estudiantes_por_dni.get(dni)
                 
                 if not estudiante:
                     errores.append(f"Fila {index + 2}: Estudiante con DNI {dni} no encontrado")
                     continue
                 
                 # Verificar que el estudiante está matriculado en el ciclo del curso
-                matricula = db.query(Matricula).filter(
-                    Matricula.estudiante_id == estudiante.id,
-                    Matricula.ciclo_id == curso.ciclo_id,
-                    Matricula.is_active == True
-                ).first()
-                
-                if not matricula:
+                if estudiante.id not in matriculados:
                     errores.append(f"Fila {index + 2}: Estudiante {nombre} {apellido} no está matriculado en este ciclo")
                     continue
                 
@@ -445,10 +478,7 @@ def upload_grades_from_excel(
                 # Si hay datos para procesar, buscar o crear la nota una sola vez
                 if todos_los_datos:
                     # Buscar si ya existe una nota para este estudiante y curso
-                    nota_existente = db.query(Nota).filter(
-                        Nota.estudiante_id == estudiante.id,
-                        Nota.curso_id == curso_id
-                    ).first()
+                    nota_existente = notas_por_estudiante.get(estudiante.id)
                     
                     if nota_existente:
                         # Actualizar nota existente
@@ -465,6 +495,8 @@ def upload_grades_from_excel(
                             **todos_los_datos
                         )
                         db.add(nueva_nota)
+                        # Por si el archivo repite al estudiante en otra fila
+                        notas_por_estudiante[estudiante.id] = nueva_nota
                         accion = 'creada'
                     
                     notas_procesadas.append({
@@ -479,7 +511,8 @@ def upload_grades_from_excel(
         
         # Guardar cambios en la base de datos
         db.commit()
-        
+        refrescar_vista(db)
+
         resultado = {
             "mensaje": "Archivo Excel procesado exitosamente",
             "notas_procesadas": len(notas_procesadas),
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator, ConfigDict
+from pydantic import BaseModel, Field, field_validator, ConfigDict
 from typing import List, Optional,Dict, Any
 from datetime import datetime, date
 from decimal import Decimal
@@ -16,9 +16,10 @@ class PasswordUpdate(BaseModel):
     new_password: str = Field(..., min_length=6)
     confirm_password: str = Field(..., min_length=6)
     
-    @validator('confirm_password')
-    def passwords_match(cls, v, values, **kwargs):
-        if 'new_password' in values and v != values['new_password']:
+    @field_validator('confirm_password', mode='after')
+    @classmethod
+    def passwords_match(cls, v, info):
+        if 'new_password' in info.data and v != info.data['new_password']:
             raise ValueError('Las contraseñas no coinciden')
         return v
 
@@ -226,7 +227,8 @@ class NotaMasivaCreate(BaseModel):
 class ActualizacionMasivaNotas(BaseModel):
     notas: List[NotaMasivaCreate]
     
-    @validator('notas')
+    @field_validator('notas', mode='after')
+    @classmethod
     def validar_notas(cls, v):
         if not v:
             raise ValueError('Debe proporcionar al menos una nota')
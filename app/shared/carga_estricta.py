@@ -0,0 +1,18 @@
+"""Detección de cargas perezosas ocultas en las consultas ORM
+
+Cualquier relación dereferenciada sin estrategia de carga explícita se
+convierte silenciosamente en un N+1. Con el flag ``raise_on_lazy_loads``
+activo (solo en desarrollo/CI), ``opciones_estrictas`` añade
+``raiseload('*')`` a las opciones de la consulta, de modo que una carga
+perezosa no prevista lanza error en lugar de emitir un SELECT extra.
+"""
+from sqlalchemy.orm import raiseload
+
+from ..config import settings
+
+
+def opciones_estrictas(*opciones):
+    """Opciones de consulta, con raiseload('*') si el flag de depuración está activo"""
+    if settings.raise_on_lazy_loads:
+        return opciones + (raiseload('*'),)
+    return opciones
@@ -0,0 +1,42 @@
+"""
+Columnas añadidas al esquema después del despliegue inicial.
+
+`Base.metadata.create_all` solo crea tablas que faltan: nunca altera una
+tabla existente, así que las columnas nuevas declaradas en los modelos no
+aparecen en bases de datos ya desplegadas. Este módulo las agrega al
+arrancar con `ALTER TABLE ... ADD COLUMN IF NOT EXISTS` (idempotente, mismo
+patrón de mejor esfuerzo que la vista materializada). En otros motores
+(p.ej. SQLite en desarrollo) la base se crea desde cero con create_all y no
+hace falta alterar nada.
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Una sentencia por columna nueva; deben reflejar la definición del modelo
+_SENTENCIAS = (
+    # User.full_name (columna generada, ver app/shared/models.py)
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS full_name VARCHAR(101) "
+    "GENERATED ALWAYS AS (first_name || ' ' || last_name) STORED",
+    # PasswordResetToken.token_hash con su índice único
+    "ALTER TABLE password_reset_tokens ADD COLUMN IF NOT EXISTS token_hash BYTEA",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_password_reset_tokens_token_hash "
+    "ON password_reset_tokens (token_hash)",
+    # Nota.promedio_final (se rellena al reescribir cada nota)
+    "ALTER TABLE notas ADD COLUMN IF NOT EXISTS promedio_final NUMERIC(4, 2)",
+)
+
+
+def asegurar_columnas(engine: Engine) -> None:
+    """Agrega a tablas existentes las columnas nuevas del modelo (solo PostgreSQL)"""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            for sentencia in _SENTENCIAS:
+                conn.execute(text(sentencia))
+    except Exception as e:
+        logger.warning(f"No se pudieron asegurar las columnas nuevas: {e}")
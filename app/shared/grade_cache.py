@@ -0,0 +1,75 @@
+"""Cache en proceso de promedios ponderados de notas
+
+El promedio de una Nota se recalcula en media docena de handlers en cada
+petición aunque la fila no haya cambiado. Aquí se memoriza el resultado:
+
+- ``promedio_valores`` aplica lru_cache sobre la tupla de valores (función
+  pura, sin invalidación necesaria).
+- ``promedio_nota`` añade una capa por (nota.id, updated_at): el sello de
+  actualización invalida solo las entradas de filas editadas, sin gestión
+  manual.
+"""
+from collections import namedtuple
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional
+
+from .grade_calculator import GradeCalculator
+
+CAMPOS_NOTA = (
+    'evaluacion1', 'evaluacion2', 'evaluacion3', 'evaluacion4',
+    'evaluacion5', 'evaluacion6', 'evaluacion7', 'evaluacion8',
+    'practica1', 'practica2', 'practica3', 'practica4',
+    'parcial1', 'parcial2',
+)
+
+class _FilaNota(namedtuple('_FilaNotaBase', CAMPOS_NOTA)):
+    """Tupla ligera de valores con los mismos accesos agrupados que Nota"""
+
+    __slots__ = ()
+
+    @property
+    def valores_evaluaciones(self):
+        return self[0:8]
+
+    @property
+    def valores_practicas(self):
+        return self[8:12]
+
+    @property
+    def valores_parciales(self):
+        return self[12:14]
+
+_PROMEDIO_CACHE_MAX = 65536
+_promedio_cache = {}  # (nota_id, updated_at) -> Optional[Decimal]
+
+
+@lru_cache(maxsize=65536)
+def promedio_valores(valores: tuple) -> Optional[Decimal]:
+    """Promedio ponderado a partir de la tupla de valores en el orden de CAMPOS_NOTA"""
+    return GradeCalculator.calcular_promedio_nota(_FilaNota(*valores))
+
+
+def promedio_nota(nota) -> Optional[Decimal]:
+    """Promedio ponderado de una Nota, cacheado por (id, updated_at)
+
+    Si la fila trae el promedio persistido (columna ``promedio_final``,
+    mantenida al escribir) se devuelve directo; el cálculo queda como
+    fallback para filas anteriores a la columna o proyecciones sin ella.
+    """
+    almacenado = getattr(nota, 'promedio_final', None)
+    if almacenado is not None:
+        return almacenado
+
+    clave = (nota.id, nota.updated_at)
+    if clave in _promedio_cache:
+        return _promedio_cache[clave]
+
+    promedio = promedio_valores(tuple(getattr(nota, campo) for campo in CAMPOS_NOTA))
+
+    # Cualquier edición posterior cambia updated_at y con él la clave, así que
+    # las entradas viejas quedan simplemente sin usar
+    if len(_promedio_cache) >= _PROMEDIO_CACHE_MAX:
+        _promedio_cache.clear()
+    _promedio_cache[clave] = promedio
+    return promedio
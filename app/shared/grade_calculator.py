@@ -1,9 +1,29 @@
+import sys
 from decimal import Decimal
 from typing import List, Dict, Optional
+
+import numpy as np
 from sqlalchemy.orm import Session
 from app.shared.models import Nota
 
 
+# Estados indexados por 0 = sin promedio, 1 = desaprobado, 2 = aprobado.
+# Internados: cada respuesta repite estas cadenas por fila y así todas las
+# filas comparten el mismo objeto (comparación por puntero, cero copias)
+_ESTADOS = tuple(sys.intern(estado) for estado in ("PENDIENTE", "DESAPROBADO", "APROBADO"))
+
+
+def estado_promedio(promedio) -> str:
+    """Estado APROBADO/DESAPROBADO/PENDIENTE según el promedio ponderado
+
+    Un solo punto para la regla de los handlers (antes un ternario triple
+    repetido por endpoint, con doble conversión a float por fila).
+    """
+    if not promedio:
+        return _ESTADOS[0]
+    return _ESTADOS[1 + (float(promedio) >= 13)]
+
+
 class GradeCalculator:
     """Calculadora de calificaciones según el sistema específico del ciclo de 4 meses"""
     
@@ -14,35 +34,92 @@ class GradeCalculator:
     
     NOTA_MINIMA_APROBACION = Decimal('13.0')
     
+    # Pesos por columna en el orden de CAMPOS_NOTA: 8 evaluaciones, 4 prácticas,
+    # 2 parciales. Cortes de categoría para las vistas del lote vectorizado
+    _CORTES_CATEGORIAS = ((0, 8), (8, 12), (12, 14))
+    _PESOS_CATEGORIAS = (0.1, 0.3, 0.6)
+
+    @classmethod
+    def promedios_lote(cls, filas) -> List[Optional[float]]:
+        """Promedios finales de un lote de filas de notas, vectorizado con NumPy
+
+        Cada fila es una secuencia de los 14 valores de calificación en el
+        orden de CAMPOS_NOTA. Replica calcular_promedio_nota (solo cuentan los
+        valores > 0, promedio por categoría redondeado a 2 decimales, suma
+        ponderada 10/30/60) pero con aritmética de arrays en lugar de un
+        Decimal por celda, así el costo por nota es el de un par de
+        reducciones sobre la matriz completa.
+        """
+        if not filas:
+            return []
+
+        arr = np.array(
+            [[float(v) if v is not None else np.nan for v in fila] for fila in filas],
+            dtype=np.float64
+        )
+        # Los valores no registrados (<= 0) no participan en los promedios
+        arr[arr <= 0] = np.nan
+
+        promedios_categorias = []
+        for inicio, fin in cls._CORTES_CATEGORIAS:
+            bloque = arr[:, inicio:fin]
+            registrados = np.sum(~np.isnan(bloque), axis=1)
+            suma = np.nansum(bloque, axis=1)
+            promedio = np.round(suma / np.maximum(registrados, 1), 2)
+            promedio[registrados == 0] = np.nan
+            promedios_categorias.append(promedio)
+
+        finales = np.round(
+            sum(p * peso for p, peso in zip(promedios_categorias, cls._PESOS_CATEGORIAS)),
+            2
+        )
+        return [None if np.isnan(final) else float(final) for final in finales]
+
+    # Nombres de columna por categoría, para filas proyectadas sin las
+    # propiedades agrupadas del modelo Nota
+    _CAMPOS_EVALUACIONES = tuple(f'evaluacion{i}' for i in range(1, 9))
+    _CAMPOS_PRACTICAS = tuple(f'practica{i}' for i in range(1, 5))
+    _CAMPOS_PARCIALES = ('parcial1', 'parcial2')
+
+    @staticmethod
+    def _tupla_categoria(nota, propiedad: str, campos) -> tuple:
+        """Tupla de valores de una categoría
+
+        Acepta tanto instancias de Nota (con las propiedades agrupadas
+        valores_*) como filas proyectadas que solo traen las columnas sueltas
+        (p.ej. el fallback de /admin/grade-distribution).
+        """
+        valores = getattr(nota, propiedad, None)
+        if valores is not None:
+            return valores
+        return tuple(getattr(nota, campo) for campo in campos)
+
+    @staticmethod
+    def _valores_validos(valores) -> List[Decimal]:
+        """Filtra los valores registrados (> 0) de una tupla de categoría"""
+        return [
+            Decimal(str(valor))
+            for valor in valores
+            if valor is not None and float(valor) > 0
+        ]
+
     @classmethod
     def calcular_promedio_evaluaciones(cls, nota: Nota) -> Optional[Decimal]:
         """Calcula el promedio de las evaluaciones semanales (1-8)"""
-        evaluaciones = []
-        for i in range(1, 9):
-            eval_val = getattr(nota, f'evaluacion{i}')
-            if eval_val is not None and float(eval_val) > 0:
-                evaluaciones.append(Decimal(str(eval_val)))
-        return cls._calcular_promedio_lista(evaluaciones)
-    
+        valores = cls._tupla_categoria(nota, 'valores_evaluaciones', cls._CAMPOS_EVALUACIONES)
+        return cls._calcular_promedio_lista(cls._valores_validos(valores))
+
     @classmethod
     def calcular_promedio_practicas(cls, nota: Nota) -> Optional[Decimal]:
         """Calcula el promedio de las prácticas (1-4)"""
-        practicas = []
-        for i in range(1, 5):
-            prac_val = getattr(nota, f'practica{i}')
-            if prac_val is not None and float(prac_val) > 0:
-                practicas.append(Decimal(str(prac_val)))
-        return cls._calcular_promedio_lista(practicas)
-    
+        valores = cls._tupla_categoria(nota, 'valores_practicas', cls._CAMPOS_PRACTICAS)
+        return cls._calcular_promedio_lista(cls._valores_validos(valores))
+
     @classmethod
     def calcular_promedio_parciales(cls, nota: Nota) -> Optional[Decimal]:
         """Calcula el promedio de los parciales (1-2)"""
-        parciales = []
-        for i in range(1, 3):
-            parc_val = getattr(nota, f'parcial{i}')
-            if parc_val is not None and float(parc_val) > 0:
-                parciales.append(Decimal(str(parc_val)))
-        return cls._calcular_promedio_lista(parciales)
+        valores = cls._tupla_categoria(nota, 'valores_parciales', cls._CAMPOS_PARCIALES)
+        return cls._calcular_promedio_lista(cls._valores_validos(valores))
 
     @classmethod
     def calcular_promedio_nota(cls, nota: Nota) -> Optional[Decimal]:
@@ -52,31 +129,10 @@ class GradeCalculator:
         - Prácticas 1-4: 30%  
         - Parciales 1-2: 60%
         """
-        # Calcular promedio de evaluaciones
-        evaluaciones = []
-        for i in range(1, 9):
-            eval_val = getattr(nota, f'evaluacion{i}')
-            if eval_val is not None and float(eval_val) > 0:
-                evaluaciones.append(Decimal(str(eval_val)))
-        
-        # Calcular promedio de prácticas
-        practicas = []
-        for i in range(1, 5):
-            prac_val = getattr(nota, f'practica{i}')
-            if prac_val is not None and float(prac_val) > 0:
-                practicas.append(Decimal(str(prac_val)))
-        
-        # Calcular promedio de parciales
-        parciales = []
-        for i in range(1, 3):
-            parc_val = getattr(nota, f'parcial{i}')
-            if parc_val is not None and float(parc_val) > 0:
-                parciales.append(Decimal(str(parc_val)))
-        
-        # Calcular promedios por categoría
-        prom_evaluaciones = cls._calcular_promedio_lista(evaluaciones)
-        prom_practicas = cls._calcular_promedio_lista(practicas)
-        prom_parciales = cls._calcular_promedio_lista(parciales)
+        # Calcular promedios por categoría sobre las tuplas agrupadas
+        prom_evaluaciones = cls.calcular_promedio_evaluaciones(nota)
+        prom_practicas = cls.calcular_promedio_practicas(nota)
+        prom_parciales = cls.calcular_promedio_parciales(nota)
         
         # Solo calcular promedio final si hay al menos una nota en cada categoría
         if prom_evaluaciones > 0 and prom_practicas > 0 and prom_parciales > 0:
@@ -120,23 +176,9 @@ class GradeCalculator:
         todos_parciales = []
         
         for nota in notas:
-            # Evaluaciones semanales (evaluacion1-8)
-            for i in range(1, 9):
-                eval_field = getattr(nota, f'evaluacion{i}', None)
-                if eval_field is not None and float(eval_field) > 0:
-                    todas_evaluaciones.append(Decimal(str(eval_field)))
-            
-            # Prácticas (practica1-4)
-            for i in range(1, 5):
-                prac_field = getattr(nota, f'practica{i}', None)
-                if prac_field is not None and float(prac_field) > 0:
-                    todas_practicas.append(Decimal(str(prac_field)))
-            
-            # Parciales (parcial1-2)
-            for i in range(1, 3):
-                parc_field = getattr(nota, f'parcial{i}', None)
-                if parc_field is not None and float(parc_field) > 0:
-                    todos_parciales.append(Decimal(str(parc_field)))
+            todas_evaluaciones.extend(cls._valores_validos(nota.valores_evaluaciones))
+            todas_practicas.extend(cls._valores_validos(nota.valores_practicas))
+            todos_parciales.extend(cls._valores_validos(nota.valores_parciales))
         
         # Calcular promedios por tipo
         promedio_evaluaciones = cls._calcular_promedio_lista(todas_evaluaciones)
@@ -155,11 +197,11 @@ class GradeCalculator:
         
         # Determinar estado
         if promedio_final >= cls.NOTA_MINIMA_APROBACION:
-            estado = "APROBADO"
+            estado = _ESTADOS[2]
         elif promedio_final > 0:
-            estado = "DESAPROBADO"
+            estado = _ESTADOS[1]
         else:
-            estado = "PENDIENTE"
+            estado = _ESTADOS[0]
         
         return {
             'promedio_final': promedio_final,
@@ -273,17 +315,9 @@ class GradeCalculator:
         parciales_count = 0
         
         for nota in notas:
-            for i in range(1, 9):
-                if getattr(nota, f'evaluacion{i}') is not None:
-                    evaluaciones_count += 1
-            
-            for i in range(1, 5):
-                if getattr(nota, f'practica{i}') is not None:
-                    practicas_count += 1
-            
-            for i in range(1, 3):
-                if getattr(nota, f'parcial{i}') is not None:
-                    parciales_count += 1
+            evaluaciones_count += sum(1 for valor in nota.valores_evaluaciones if valor is not None)
+            practicas_count += sum(1 for valor in nota.valores_practicas if valor is not None)
+            parciales_count += sum(1 for valor in nota.valores_parciales if valor is not None)
         
         return {
             'valido': evaluaciones_count > 0 and practicas_count > 0 and parciales_count > 0,
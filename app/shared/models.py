@@ -1,7 +1,7 @@
 """
 Modelos compartidos del sistema
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, Text, Numeric, Date, UniqueConstraint
+from sqlalchemy import Column, Computed, Index, Integer, String, Boolean, DateTime, Enum, ForeignKey, LargeBinary, Text, Numeric, Date, UniqueConstraint, event, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -21,6 +21,9 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
+    # Columna generada por la BD: la concatenación se calcula una vez al
+    # escribir la fila y puede proyectarse directo en los SELECT
+    full_name = Column(String(101), Computed("first_name || ' ' || last_name", persisted=True))
     phone = Column(String(15), nullable=True)
     role = Column(Enum(RoleEnum), nullable=False)
     
@@ -56,18 +59,17 @@ class User(Base):
 
     def __repr__(self):
         return f"<User(dni={self.dni}, email={self.email}, role={self.role})>"
-    
-    @property
-    def full_name(self):
-        return f"{self.first_name} {self.last_name}"
 
 class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    identificator_token = Column(String(255), unique=True, nullable=False)
-    token = Column(String(255), unique=True, nullable=False)
+    identificator_token = Column(String(255), unique=True, index=True, nullable=False)
+    token = Column(String(255), unique=True, index=True, nullable=False)
+    # Huella blake2b de 16 bytes del token de verificación: el índice binario
+    # es más compacto que el texto base64 y la búsqueda no compara el token plano
+    token_hash = Column(LargeBinary(16), unique=True, index=True, nullable=True)
     expires_at = Column(DateTime(timezone=True), nullable=False)
     used = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -118,7 +120,17 @@ class Ciclo(Base):
 
 class Curso(Base):
     __tablename__ = "cursos"
-    
+    # Índices para los predicados calientes de los listados de cursos:
+    # "cursos activos del ciclo" (parcial en PostgreSQL) y "cursos del docente"
+    __table_args__ = (
+        Index(
+            'ix_curso_ciclo_activo',
+            'ciclo_id',
+            postgresql_where=text('is_active')
+        ),
+        Index('ix_curso_docente', 'docente_id'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(100), nullable=False)
     descripcion = Column(Text, nullable=True)
@@ -138,7 +150,17 @@ class Curso(Base):
 
 class Matricula(Base):
     __tablename__ = "matriculas"
-    
+    # Índice parcial para el predicado "matrículas activas del estudiante"
+    # que repiten todos los endpoints de calificaciones (en PostgreSQL
+    # permite un index-only scan; en otros dialectos queda como índice normal)
+    __table_args__ = (
+        Index(
+            'ix_matricula_estudiante_activa',
+            'estudiante_id',
+            postgresql_where=text('is_active')
+        ),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     estudiante_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     ciclo_id = Column(Integer, ForeignKey("ciclos.id"), nullable=False)
@@ -183,6 +205,10 @@ class Nota(Base):
     parcial1 = Column(Numeric(4, 2), nullable=True)
     parcial2 = Column(Numeric(4, 2), nullable=True)
 
+    # Promedio ponderado persistido: se recalcula al escribir la nota (ver el
+    # listener al pie del módulo), así las lecturas no repiten el cálculo
+    promedio_final = Column(Numeric(4, 2), nullable=True)
+
     # Campos de control
     fecha_registro = Column(Date, nullable=False, default=func.current_date())
     observaciones = Column(Text, nullable=True)
@@ -196,9 +222,31 @@ class Nota(Base):
     
     # Constraint para evitar duplicados
     __table_args__ = (
+        # La restricción única también sirve de índice compuesto para el
+        # filtro "notas del estudiante en estos cursos" de los endpoints
         UniqueConstraint('estudiante_id', 'curso_id', name='uq_estudiante_curso'),
+        # Índice para el listado de notas recientes del dashboard
+        # (ORDER BY updated_at DESC con LIMIT por estudiante)
+        Index('ix_nota_estudiante_updated', 'estudiante_id', 'updated_at'),
     )
     
+    # Acceso agrupado por categoría (estilo "structure of arrays"): una tupla
+    # por grupo en lugar de 14 getattr dispersos en cada consumidor
+    @property
+    def valores_evaluaciones(self):
+        return (
+            self.evaluacion1, self.evaluacion2, self.evaluacion3, self.evaluacion4,
+            self.evaluacion5, self.evaluacion6, self.evaluacion7, self.evaluacion8,
+        )
+
+    @property
+    def valores_practicas(self):
+        return (self.practica1, self.practica2, self.practica3, self.practica4)
+
+    @property
+    def valores_parciales(self):
+        return (self.parcial1, self.parcial2)
+
     def calcular_promedio_final(self):
         """Calcula el promedio final usando GradeCalculator con pesos correctos: 10% evaluaciones, 30% prácticas, 60% parciales"""
         from .grade_calculator import GradeCalculator
@@ -207,8 +255,8 @@ class Nota(Base):
     
     def obtener_estado(self):
         """Determina el estado basado en el promedio final"""
-        promedio = self.calcular_promedio_final()
-        return "APROBADO" if promedio >= 13 else "DESAPROBADO" if promedio > 0 else "PENDIENTE"
+        from .grade_calculator import estado_promedio
+        return estado_promedio(self.calcular_promedio_final())
     
     def __repr__(self):
         return f"<Nota(estudiante_id={self.estudiante_id}, curso_id={self.curso_id}, promedio_final={self.calcular_promedio_final()})>"
@@ -261,4 +309,13 @@ class SiteConfig(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     def __repr__(self):
-        return f"<SiteConfig(key={self.key}, value={self.value})>"
\ No newline at end of file
+        return f"<SiteConfig(key={self.key}, value={self.value})>"
+
+# Mantener el promedio persistido al escribir la nota (equivalente a un
+# trigger BEFORE INSERT/UPDATE): el cálculo corre una vez por escritura en
+# lugar de en cada lectura de los seis endpoints que lo consumen
+@event.listens_for(Nota, 'before_insert')
+@event.listens_for(Nota, 'before_update')
+def _persistir_promedio_final(mapper, connection, nota):
+    from .grade_calculator import GradeCalculator
+    nota.promedio_final = GradeCalculator.calcular_promedio_nota(nota)
\ No newline at end of file
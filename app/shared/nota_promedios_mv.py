@@ -0,0 +1,130 @@
+"""
+Vista materializada con los promedios precalculados de cada nota.
+
+`/admin/grade-distribution` es de solo lectura pero la tabla `notas` se
+escribe con poca frecuencia; mantener los promedios ponderados en una vista
+materializada de PostgreSQL evita recalcularlos en Python en cada petición.
+En otros motores (p.ej. SQLite en desarrollo) la vista no existe y los
+endpoints recurren al cálculo en Python.
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+MV_NOMBRE = "mv_nota_promedios"
+
+_CREAR_VISTA_SQL = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS {MV_NOMBRE} AS
+SELECT n.id AS nota_id,
+       n.estudiante_id,
+       n.curso_id,
+       ROUND(p.prom_evaluaciones * 0.1 +
+             p.prom_practicas   * 0.3 +
+             p.prom_parciales   * 0.6, 2) AS promedio,
+       CASE WHEN ROUND(p.prom_evaluaciones * 0.1 +
+                       p.prom_practicas   * 0.3 +
+                       p.prom_parciales   * 0.6, 2) >= 13
+            THEN 'APROBADO' ELSE 'DESAPROBADO' END AS estado
+FROM notas n
+CROSS JOIN LATERAL (
+    SELECT
+        (SELECT ROUND(AVG(v), 2) FROM unnest(ARRAY[
+            n.evaluacion1, n.evaluacion2, n.evaluacion3, n.evaluacion4,
+            n.evaluacion5, n.evaluacion6, n.evaluacion7, n.evaluacion8
+        ]) AS v WHERE v > 0) AS prom_evaluaciones,
+        (SELECT ROUND(AVG(v), 2) FROM unnest(ARRAY[
+            n.practica1, n.practica2, n.practica3, n.practica4
+        ]) AS v WHERE v > 0) AS prom_practicas,
+        (SELECT ROUND(AVG(v), 2) FROM unnest(ARRAY[
+            n.parcial1, n.parcial2
+        ]) AS v WHERE v > 0) AS prom_parciales
+) p
+WHERE p.prom_evaluaciones IS NOT NULL
+  AND p.prom_practicas IS NOT NULL
+  AND p.prom_parciales IS NOT NULL
+"""
+
+# Índice único requerido por REFRESH MATERIALIZED VIEW CONCURRENTLY
+_CREAR_INDICE_SQL = (
+    f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{MV_NOMBRE}_nota_id "
+    f"ON {MV_NOMBRE} (nota_id)"
+)
+
+# Índice único por estudiante y curso (a lo sumo una nota por par) para que
+# las agregaciones por estudiante lean la vista con un index scan
+_CREAR_INDICE_ESTUDIANTE_SQL = (
+    f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{MV_NOMBRE}_estudiante_curso "
+    f"ON {MV_NOMBRE} (estudiante_id, curso_id)"
+)
+
+# Detecta instalaciones con la versión anterior de la vista (sin las
+# columnas estudiante_id/curso_id/estado) para recrearla al arrancar
+_VISTA_ACTUALIZADA_SQL = text(
+    "SELECT 1 FROM information_schema.columns "
+    "WHERE table_name = :vista AND column_name = 'estudiante_id'"
+)
+
+
+# Resultado memorizado de la comprobación de existencia: None hasta la
+# primera consulta (o hasta que crear_vista registre el desenlace)
+_vista_existe = None
+
+
+def vista_disponible(bind) -> bool:
+    """Indica si la vista materializada existe y puede consultarse
+
+    Comprueba el dialecto y, una sola vez, que la vista realmente exista:
+    si crear_vista falló al arrancar (p.ej. por permisos), los endpoints
+    deben usar su fallback en lugar de fallar con 500.
+    """
+    global _vista_existe
+    if bind.dialect.name != "postgresql":
+        return False
+    if _vista_existe is None:
+        try:
+            with bind.engine.connect() as conn:
+                _vista_existe = conn.execute(
+                    text("SELECT to_regclass(:vista)"), {"vista": MV_NOMBRE}
+                ).scalar() is not None
+        except Exception as e:
+            logger.warning(f"No se pudo comprobar la vista {MV_NOMBRE}: {e}")
+            return False
+    return _vista_existe
+
+
+def crear_vista(engine: Engine) -> None:
+    """Crea la vista materializada y sus índices (solo PostgreSQL)"""
+    global _vista_existe
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            actualizada = conn.execute(
+                _VISTA_ACTUALIZADA_SQL, {"vista": MV_NOMBRE}
+            ).first()
+            if not actualizada:
+                conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {MV_NOMBRE}"))
+            conn.execute(text(_CREAR_VISTA_SQL))
+            conn.execute(text(_CREAR_INDICE_SQL))
+            conn.execute(text(_CREAR_INDICE_ESTUDIANTE_SQL))
+        _vista_existe = True
+    except Exception as e:
+        logger.warning(f"No se pudo crear la vista {MV_NOMBRE}: {e}")
+        _vista_existe = False
+
+
+def refrescar_vista(db: Session) -> None:
+    """Refresca la vista tras una escritura de notas (mejor esfuerzo)"""
+    bind = db.get_bind()
+    if not vista_disponible(bind):
+        return
+    try:
+        # REFRESH ... CONCURRENTLY no puede ejecutarse dentro de una transacción
+        with bind.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {MV_NOMBRE}"))
+    except Exception as e:
+        logger.warning(f"No se pudo refrescar la vista {MV_NOMBRE}: {e}")
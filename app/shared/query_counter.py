@@ -0,0 +1,53 @@
+"""
+Contador de consultas SQL por petición.
+
+Guardarraíl para detectar regresiones N+1: cuenta las consultas que ejecuta
+cada petición y, en modo debug, el middleware expone el total en la cabecera
+X-DB-Query-Count y registra un aviso cuando se supera el presupuesto.
+"""
+import logging
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Presupuesto orientativo de consultas por petición
+PRESUPUESTO_CONSULTAS = 10
+
+# Se guarda una lista de un elemento para que los incrementos hechos en el
+# hilo del handler (contexto copiado por el threadpool) sigan siendo visibles
+# desde el middleware
+_consultas: ContextVar = ContextVar("consultas_sql", default=None)
+
+
+def instalar(engine: Engine) -> None:
+    """Registra el listener que incrementa el contador en cada consulta"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        contador = _consultas.get()
+        if contador is not None:
+            contador[0] += 1
+
+
+def reiniciar() -> None:
+    """Pone el contador a cero al inicio de la petición"""
+    _consultas.set([0])
+
+
+def total() -> int:
+    """Devuelve el número de consultas ejecutadas en la petición actual"""
+    contador = _consultas.get()
+    return contador[0] if contador is not None else 0
+
+
+def avisar_si_excede(ruta: str) -> None:
+    """Registra un aviso si la petición superó el presupuesto de consultas"""
+    consultas = total()
+    if consultas > PRESUPUESTO_CONSULTAS:
+        logger.warning(
+            f"{ruta} ejecutó {consultas} consultas SQL "
+            f"(presupuesto: {PRESUPUESTO_CONSULTAS}); posible N+1"
+        )
@@ -0,0 +1,18 @@
+"""Respuesta JSON serializada con orjson
+
+Equivalente a fastapi.responses.ORJSONResponse, que está deprecada en la
+versión de FastAPI que usamos. orjson codifica en C (datetime, date y dicts
+anidados incluidos), varias veces más rápido que json.dumps y sin pasar por
+jsonable_encoder.
+"""
+from typing import Any
+
+import orjson
+from fastapi import Response
+
+
+class RespuestaORJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
@@ -2,9 +2,13 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, Response
+import asyncio
 import os
 from app.config import settings
 from app.database import engine, Base
+from app.shared.columnas_ddl import asegurar_columnas
+from app.shared.nota_promedios_mv import crear_vista
+from app.shared.respuesta_orjson import RespuestaORJSON
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
 # Importar todos los routers de los módulos
@@ -17,13 +21,24 @@ from app.modules.admin.config_routes import router as admin_config_router
 # Crear las tablas en la base de datos
 Base.metadata.create_all(bind=engine)
 
-# Crear la aplicación FastAPI
+# create_all no altera tablas existentes: agregar las columnas nuevas del
+# modelo en bases ya desplegadas (solo PostgreSQL, idempotente)
+asegurar_columnas(engine)
+
+# Crear la vista materializada de promedios (solo PostgreSQL)
+crear_vista(engine)
+
+# Crear la aplicación FastAPI.
+# Todas las respuestas JSON se serializan con orjson (C) por defecto; los
+# endpoints calientes ya devolvían RespuestaORJSON y el resto se beneficia
+# sin cambios en los handlers
 app = FastAPI(
     title="Sistema de Notas Académico",
     description="API modular para gestión de notas académicas con roles diferenciados",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=RespuestaORJSON
 )
 
 # Configurar CORS
@@ -39,6 +54,20 @@ app.add_middleware(
 # Confiar en los encabezados del proxy para detectar esquema/host reales
 app.add_middleware(ProxyHeadersMiddleware)
 
+# Instrumentación de consultas SQL por petición (solo en modo debug)
+if settings.debug:
+    from app.shared import query_counter
+
+    query_counter.instalar(engine)
+
+    @app.middleware("http")
+    async def contar_consultas_sql(request: Request, call_next):
+        query_counter.reiniciar()
+        response = await call_next(request)
+        response.headers["X-DB-Query-Count"] = str(query_counter.total())
+        query_counter.avisar_si_excede(request.url.path)
+        return response
+
 # Incluir todos los routers con prefijos organizados
 app.include_router(auth_router, prefix="/api/v1", tags=["Autenticación"])
 app.include_router(student_router, prefix="/api/v1", tags=["Estudiante"])
@@ -64,8 +93,15 @@ class StaticFilesCORS(StaticFiles):
 # Montar directorio de archivos estáticos con CORS
 app.mount("/static", StaticFilesCORS(directory="static"), name="static")
 
+@app.on_event("startup")
+async def iniciar_limpieza_tokens():
+    """Arranca la limpieza horaria de tokens de recuperación expirados"""
+    from app.modules.auth.token_cleanup import ejecutar_limpieza_periodica
+
+    asyncio.create_task(ejecutar_limpieza_periodica())
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {
         "mensaje": "Sistema de Notas Académico API 🎓",
         "version": "1.0.0",
@@ -73,5 +109,9 @@ def read_root():
     }
 
 @app.get("/health")
-def health_check():
-    return {"status": "ok", "message": "API funcionando correctamente"}
\ No newline at end of file
+async def health_check():
+    return {
+        "status": "ok",
+        "message": "API funcionando correctamente",
+        "pool": engine.pool.status()
+    }
\ No newline at end of file